@@ -0,0 +1,465 @@
+import os
+import io
+import sys
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Preprocesses avatar GLBs into smaller files that GLTFLoader parses and uploads
+# faster: vertex attributes are quantized (KHR_mesh_quantization), textures are
+# downscaled and animation clips the viewer never plays are dropped. Results are
+# cached under a digest of the source file and the settings, so a model is only
+# processed once. Run `python __asset_cache.py models/*.glb` to fill the cache
+# ahead of time.
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+COMPONENT_IDS = {np.dtype(dtype): component for component, dtype in COMPONENT_TYPES.items()}
+COMPONENT_COUNTS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+
+# Attributes that are safe to quantize without touching node transforms. POSITION
+# is left as float because skinned meshes would need their bind poses rescaled.
+QUANTIZED_ATTRIBUTES = {'NORMAL': np.int8, 'TANGENT': np.int8, 'TEXCOORD': np.uint16}
+
+# Texture formats that are downscaled and written back in the same format
+IMAGE_SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+# Mesh compression extensions whose data is referenced from bufferViews
+COMPRESSION_EXTENSIONS = {'KHR_draco_mesh_compression', 'EXT_meshopt_compression'}
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'ai_assistant' / 'avatars'
+
+
+def read_glb(data: bytes):
+    """Split a GLB into its JSON document and binary chunk"""
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError("not a glTF 2.0 binary file")
+
+    document, binary = None, b''
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            document = json.loads(chunk)
+        elif chunk_type == CHUNK_BIN:
+            binary = chunk
+        offset += 8 + chunk_length
+    if document is None:
+        raise ValueError("GLB has no JSON chunk")
+    return document, binary
+
+
+def write_glb(document: dict, binary: bytes) -> bytes:
+    content = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    content += b' ' * (-len(content) % 4)
+    binary += b'\0' * (-len(binary) % 4)
+
+    length = 12 + 8 + len(content) + (8 + len(binary) if binary else 0)
+    parts = [struct.pack('<III', GLB_MAGIC, 2, length),
+             struct.pack('<II', len(content), CHUNK_JSON), content]
+    if binary:
+        parts += [struct.pack('<II', len(binary), CHUNK_BIN), binary]
+    return b''.join(parts)
+
+
+class GLBOptimizer:
+    """Rewrites one GLB document and its binary chunk
+
+    Every kept accessor and image is copied into a freshly packed buffer, which
+    also drops data that only belonged to pruned animations.
+    """
+
+    def __init__(self, texture_size=512, keep_animations=1, quantize=True):
+        self.texture_size = texture_size
+        self.keep_animations = keep_animations
+        self.quantize = quantize
+        self.logger = logging.getLogger(__name__)
+
+    def settings(self) -> dict:
+        return {
+            'texture_size': self.texture_size,
+            'keep_animations': self.keep_animations,
+            'quantize': self.quantize,
+        }
+
+    def optimize(self, data: bytes) -> bytes:
+        document, binary = read_glb(data)
+        buffers = document.get('buffers', [])
+        if len(buffers) > 1 or any('uri' in buffer for buffer in buffers):
+            raise ValueError("external buffers are not supported")
+        if any('sparse' in accessor for accessor in document.get('accessors', [])):
+            raise ValueError("sparse accessors are not supported")
+        # These extensions keep their compressed data in bufferViews that the
+        # repacking below does not know about, so such files are left as they are
+        compressed = COMPRESSION_EXTENSIONS.intersection(document.get('extensionsUsed', []))
+        if compressed:
+            raise ValueError(f"{', '.join(sorted(compressed))} is not supported")
+
+        self.binary = binary
+        self.output = io.BytesIO()
+        self.views = []
+
+        self._prune_animations(document)
+        semantics = self._attribute_semantics(document)
+        accessors = self._used_accessors(document)
+
+        remap = {}
+        new_accessors = []
+        quantized = False
+        for index in sorted(accessors):
+            accessor = dict(document['accessors'][index])
+            if 'bufferView' in accessor:
+                quantized |= self._copy_accessor(document, accessor, semantics.get(index))
+            remap[index] = len(new_accessors)
+            new_accessors.append(accessor)
+
+        for image in document.get('images', []):
+            if 'bufferView' in image:
+                image['bufferView'] = self._add_view(self._resize_image(document, image))
+
+        self._remap_accessors(document, remap)
+        document['accessors'] = new_accessors
+        document['bufferViews'] = self.views
+        if self.views:
+            document['buffers'] = [{'byteLength': self.output.tell()}]
+        else:
+            document.pop('buffers', None)
+
+        if quantized:
+            for key in ('extensionsUsed', 'extensionsRequired'):
+                extensions = document.setdefault(key, [])
+                if 'KHR_mesh_quantization' not in extensions:
+                    extensions.append('KHR_mesh_quantization')
+        return write_glb(document, self.output.getvalue())
+
+    def _prune_animations(self, document):
+        # The viewer only ever plays the first clip
+        animations = document.get('animations', [])
+        if self.keep_animations is not None and len(animations) > self.keep_animations:
+            document['animations'] = animations[:self.keep_animations]
+            if not document['animations']:
+                del document['animations']
+
+    @staticmethod
+    def _attribute_semantics(document):
+        """Accessor index -> attribute name without its set number, or 'indices'
+
+        Accessors with more than one kind of use map to None and are kept as they are.
+        """
+        semantics = {}
+
+        def add(index, name):
+            if semantics.setdefault(index, name) != name:
+                semantics[index] = None
+
+        for mesh in document.get('meshes', []):
+            for primitive in mesh.get('primitives', []):
+                for name, index in primitive.get('attributes', {}).items():
+                    add(index, name.split('_')[0] if name[-1].isdigit() else name)
+                if 'indices' in primitive:
+                    add(primitive['indices'], 'indices')
+                # Morph target deltas are not limited to [-1, 1], keep them as they are
+                for target in primitive.get('targets', []):
+                    for index in target.values():
+                        semantics[index] = None
+        return semantics
+
+    @staticmethod
+    def _used_accessors(document):
+        used = set()
+        for mesh in document.get('meshes', []):
+            for primitive in mesh.get('primitives', []):
+                used.update(primitive.get('attributes', {}).values())
+                for target in primitive.get('targets', []):
+                    used.update(target.values())
+                if 'indices' in primitive:
+                    used.add(primitive['indices'])
+        for skin in document.get('skins', []):
+            if 'inverseBindMatrices' in skin:
+                used.add(skin['inverseBindMatrices'])
+        for animation in document.get('animations', []):
+            for sampler in animation.get('samplers', []):
+                used.update((sampler['input'], sampler['output']))
+        return used
+
+    @staticmethod
+    def _remap_accessors(document, remap):
+        for mesh in document.get('meshes', []):
+            for primitive in mesh.get('primitives', []):
+                attributes = primitive.get('attributes', {})
+                for name in attributes:
+                    attributes[name] = remap[attributes[name]]
+                for target in primitive.get('targets', []):
+                    for name in target:
+                        target[name] = remap[target[name]]
+                if 'indices' in primitive:
+                    primitive['indices'] = remap[primitive['indices']]
+        for skin in document.get('skins', []):
+            if 'inverseBindMatrices' in skin:
+                skin['inverseBindMatrices'] = remap[skin['inverseBindMatrices']]
+        for animation in document.get('animations', []):
+            for sampler in animation.get('samplers', []):
+                sampler['input'] = remap[sampler['input']]
+                sampler['output'] = remap[sampler['output']]
+
+    def _read_accessor(self, document, accessor):
+        view = document['bufferViews'][accessor['bufferView']]
+        dtype = np.dtype(COMPONENT_TYPES[accessor['componentType']])
+        components = COMPONENT_COUNTS[accessor['type']]
+        stride = view.get('byteStride') or dtype.itemsize * components
+        offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+        array = np.ndarray((accessor['count'], components), dtype=dtype, buffer=self.binary,
+                           offset=offset, strides=(stride, dtype.itemsize))
+        return array.copy(), view.get('target')
+
+    def _copy_accessor(self, document, accessor, semantic):
+        """Copy an accessor's data into its own view; returns True if it needs KHR_mesh_quantization"""
+        array, target = self._read_accessor(document, accessor)
+        is_attribute = semantic not in (None, 'indices') or target == ARRAY_BUFFER
+
+        quantized = False
+        if self.quantize and len(array):
+            narrowed = self._quantize(accessor, array, semantic)
+            if narrowed is not None:
+                array = narrowed
+                quantized = semantic in ('NORMAL', 'TANGENT')
+
+        stride = None
+        if is_attribute:
+            # Vertex attribute elements have to start on 4-byte boundaries
+            row = array.dtype.itemsize * array.shape[1]
+            padded = row + (-row % 4)
+            if padded != row:
+                rows = np.zeros((len(array), padded), dtype=np.uint8)
+                rows[:, :row] = array.view(np.uint8).reshape(len(array), row)
+                array = rows
+                stride = padded
+
+        if semantic == 'indices':
+            target = ELEMENT_ARRAY_BUFFER
+        elif is_attribute:
+            target = ARRAY_BUFFER
+        accessor['bufferView'] = self._add_view(array.tobytes(), target, stride)
+        accessor.pop('byteOffset', None)
+        return quantized
+
+    @staticmethod
+    def _quantize(accessor, array, semantic):
+        """Narrower encoding of an accessor's data, or None to keep it as it is"""
+        if semantic == 'indices':
+            # 16-bit indices are enough for any mesh under 65535 vertices
+            if array.dtype.itemsize <= 2 or array.max() >= 65535:
+                return None
+            narrowed = array.astype(np.uint16)
+        elif semantic == 'JOINTS':
+            if array.dtype.itemsize == 1 or array.max() > 255:
+                return None
+            narrowed = array.astype(np.uint8)
+        elif array.dtype != np.float32:
+            return None
+        elif semantic == 'WEIGHTS':
+            # Round to bytes, then give the rounding error to the largest weight so rows still sum to 1
+            narrowed = np.round(np.clip(array, 0, 1) * 255).astype(np.int16)
+            rows = np.arange(len(array))
+            narrowed[rows, array.argmax(axis=1)] += 255 - narrowed.sum(axis=1)
+            narrowed = np.clip(narrowed, 0, 255).astype(np.uint8)
+            accessor['normalized'] = True
+        elif semantic in QUANTIZED_ATTRIBUTES:
+            dtype = QUANTIZED_ATTRIBUTES[semantic]
+            if dtype is np.uint16 and (array.min() < 0 or array.max() > 1):
+                return None
+            narrowed = np.round(np.clip(array, -1, 1) * np.iinfo(dtype).max).astype(dtype)
+            accessor['normalized'] = True
+        else:
+            return None
+
+        accessor['componentType'] = COMPONENT_IDS[narrowed.dtype]
+        if accessor.get('normalized'):
+            accessor.pop('min', None)
+            accessor.pop('max', None)
+        return narrowed
+
+    def _add_view(self, data: bytes, target=None, stride=None) -> int:
+        self.output.write(b'\0' * (-self.output.tell() % 4))
+        view = {'buffer': 0, 'byteOffset': self.output.tell(), 'byteLength': len(data)}
+        if stride:
+            view['byteStride'] = stride
+        if target:
+            view['target'] = target
+        self.output.write(data)
+        self.views.append(view)
+        return len(self.views) - 1
+
+    def _resize_image(self, document, image) -> bytes:
+        view = document['bufferViews'][image['bufferView']]
+        start = view.get('byteOffset', 0)
+        data = bytes(self.binary[start:start + view['byteLength']])
+        if not self.texture_size:
+            return data
+
+        try:
+            # Optional dependency; without it textures are copied unchanged
+            from PIL import Image
+        except ImportError:
+            self.logger.warning("Pillow is not installed, textures are not downscaled")
+            return data
+
+        try:
+            picture = Image.open(io.BytesIO(data))
+            picture_format = picture.format
+            # KTX2 and other formats Pillow cannot write are copied unchanged
+            if picture_format not in IMAGE_SAVE_OPTIONS or max(picture.size) <= self.texture_size:
+                return data
+            picture.thumbnail((self.texture_size, self.texture_size), Image.LANCZOS)
+            if picture_format == 'JPEG':
+                picture = picture.convert('RGB')
+            elif picture_format == 'WEBP' and picture.mode not in ('RGB', 'RGBA'):
+                picture = picture.convert('RGBA')
+            output = io.BytesIO()
+            picture.save(output, picture_format, **IMAGE_SAVE_OPTIONS[picture_format])
+        except (OSError, ValueError, KeyError) as e:
+            # Unreadable data, or a Pillow built without the codec
+            self.logger.warning(f"Texture {image.get('name', image['bufferView'])} copied unchanged: {e}")
+            return data
+        # Whatever the source claimed, the bytes are now in this format
+        image['mimeType'] = Image.MIME[picture_format]
+        return output.getvalue()
+
+
+class AssetCache:
+    """Content-addressed cache of preprocessed avatar models
+
+    The cache file name is a digest of the source GLB and the optimizer
+    settings, so editing a model or changing a setting produces a new entry
+    instead of serving a stale one. prepare() also writes a small sidecar
+    named after the source's path, size and modification time that holds the
+    content digest, so lookup() can find the entry without reading the model.
+    """
+
+    SUFFIX = '.glb'
+    REF_SUFFIX = '.ref'
+
+    def __init__(self, directory=None, optimizer: GLBOptimizer = None):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.optimizer = optimizer or GLBOptimizer()
+        self.logger = logging.getLogger(__name__)
+
+    def key(self, data: bytes) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(self.optimizer.settings(), sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def _ref_path(self, model_path) -> Path:
+        stat = os.stat(model_path)
+        payload = json.dumps([os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns,
+                              self.optimizer.settings()], sort_keys=True)
+        return self.directory / f"{hashlib.sha256(payload.encode('utf-8')).hexdigest()}{self.REF_SUFFIX}"
+
+    def lookup(self, model_path) -> Path:
+        """Path of the cached model, or None if it has not been processed yet
+
+        Only stats the source, so it is cheap enough for the GUI thread. A
+        model that was touched or moved counts as a miss until prepare() has
+        hashed it again.
+        """
+        try:
+            key = self._ref_path(model_path).read_text().strip()
+        except OSError:
+            return None
+        path = self._path(key)
+        return path if path.exists() else None
+
+    def prepare(self, model_path) -> Path:
+        """Process a model into the cache if needed and return the cached path"""
+        data = Path(model_path).read_bytes()
+        key = self.key(data)
+        path = self._path(key)
+        if path.exists():
+            self._write_ref(model_path, key)
+            return path
+
+        start = time.perf_counter()
+        output = self.optimizer.optimize(data)
+        # Write to a temporary name first so the viewer never loads a partial file
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(output)
+        os.replace(temp_path, path)
+        self._write_ref(model_path, key)
+
+        self.logger.info(f"Preprocessed {model_path}: {len(data) / 1024:.0f} KiB -> "
+                         f"{len(output) / 1024:.0f} KiB in {time.perf_counter() - start:.2f} s")
+        return path
+
+    def _write_ref(self, model_path, key):
+        try:
+            self._ref_path(model_path).write_text(key)
+        except OSError as e:
+            self.logger.warning(f"Could not record the cache entry of {model_path}: {e}")
+
+    def clear(self):
+        for suffix in (self.SUFFIX, self.REF_SUFFIX):
+            for path in self.directory.glob(f"*{suffix}"):
+                path.unlink(missing_ok=True)
+
+
+class AssetWorker(QThread):
+    """Preprocesses a model into the cache off the GUI thread"""
+    finished = pyqtSignal(str, str)
+    error = pyqtSignal(str, str)
+
+    def __init__(self, cache: AssetCache, model_path):
+        super().__init__()
+        self.cache = cache
+        self.model_path = model_path
+
+    def run(self):
+        try:
+            self.finished.emit(self.model_path, str(self.cache.prepare(self.model_path)))
+        except Exception as e:
+            self.error.emit(self.model_path, str(e))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cache = AssetCache()
+    for model_path in sys.argv[1:]:
+        try:
+            print(f"{model_path}: {cache.prepare(model_path)}")
+        except (OSError, ValueError) as e:
+            print(f"{model_path}: skipped ({e})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
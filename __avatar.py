@@ -1,20 +1,68 @@
 import os
+import time
+import base64
+import hashlib
 from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, QObject, pyqtSlot
+from PyQt5.QtCore import QUrl, QObject, pyqtSlot, pyqtSignal
 from PyQt5.QtWebChannel import QWebChannel
 
+from __asset_cache import AssetCache, AssetWorker
+from __lipsync import FRAME_MS as LIP_SYNC_FRAME_MS
+
+# three.js r128 and its loaders are vendored here by __vendor.py
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web', 'vendor', 'three')
+THREE_FILES = ('three.min.js', 'OrbitControls.js', 'GLTFLoader.js')
+
+# Loading three.js from the CDN is opt-in; without it a missing vendor directory is an error
+THREE_CDN_ENV = 'AI_ASSISTANT_THREE_CDN'
+THREE_SCRIPTS = {
+    'local': [f"web/vendor/three/{name}" for name in THREE_FILES],
+    'cdn': [
+        "https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js",
+        "https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js",
+        "https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/GLTFLoader.js",
+    ],
+}
+
+
+def three_source():
+    """'local' when three.js is vendored, 'cdn' when the CDN is allowed, otherwise None"""
+    if all(os.path.exists(os.path.join(VENDOR_DIR, name)) for name in THREE_FILES):
+        return 'local'
+    if os.environ.get(THREE_CDN_ENV, '') == '1':
+        return 'cdn'
+    return None
+
+
 class ModelController(QObject):
+    # Re-emits viewer log lines for anything in Python that wants to follow them
+    message = pyqtSignal(str)
+    # Delivered to the page over the web channel: base64 track, frame length in ms, start in epoch ms
+    lip_sync = pyqtSignal(str, int, float)
+    lip_sync_stopped = pyqtSignal()
+
     def __init__(self):
         super().__init__()
     
     @pyqtSlot(str)
     def log(self, message):
         print("Model Viewer:", message)
+        self.message.emit(message)
 
 class AvatarWidget(QWidget):
-    def __init__(self):
+    # The viewer page has loaded and its scripts have run; models can be loaded from here on
+    viewer_loaded = pyqtSignal(bool)
+
+    # Frame rate cap for the viewer; an idle avatar is not redrawn at all
+    DEFAULT_MAX_FPS = 30
+
+    QUALITY_PRESETS = ('auto', 'low', 'medium', 'high')
+
+    def __init__(self, max_fps=DEFAULT_MAX_FPS, quality='auto'):
         super().__init__()
+        if quality not in self.QUALITY_PRESETS:
+            raise ValueError(f"Unknown quality preset: {quality}")
         self.layout = QVBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
         
@@ -28,19 +76,95 @@ class AvatarWidget(QWidget):
         self.layout.addWidget(self.web_view)
         self.setLayout(self.layout)
         
+        self.asset_cache = None
+        self.asset_worker = None
+        self.model_path = None
+        self.max_fps = max_fps
+        self.quality = quality
+
+        self.web_view.loadFinished.connect(self.on_viewer_loaded)
         self.initialize_viewer()
 
     def initialize_viewer(self):
-        base_path = os.path.dirname(os.path.abspath(__file__))
+        # Trailing separator so relative script paths resolve inside the package
+        base_path = os.path.dirname(os.path.abspath(__file__)) + os.sep
+        self.three_source = three_source()
+        self.load_started = time.perf_counter()
+        if self.three_source is None:
+            print(f"three.js r128 is missing from {VENDOR_DIR}; run 'python __vendor.py' "
+                  f"or set {THREE_CDN_ENV}=1 to load it from the CDN")
+            self.web_view.setHtml(MISSING_THREE_HTML, QUrl.fromLocalFile(base_path))
+            return
+        if self.three_source == 'cdn':
+            print("Loading three.js from the CDN")
         self.web_view.setHtml(self.get_viewer_html(), QUrl.fromLocalFile(base_path))
 
-    def set_avatar_model(self, model_path):
-        if os.path.exists(model_path):
-            model_url = QUrl.fromLocalFile(os.path.abspath(model_path)).toString()
-            js_code = f"loadModel('{model_url}')"
-            self.web_view.page().runJavaScript(js_code)
-        else:
+    def on_viewer_loaded(self, ok):
+        # The placeholder page loads fine but has no viewer behind it
+        ok = ok and self.three_source is not None
+        elapsed = (time.perf_counter() - self.load_started) * 1000
+        print(f"Avatar viewer page {'loaded' if ok else 'failed to load'} in {elapsed:.0f} ms")
+        if ok:
+            self.set_max_fps(self.max_fps)
+        self.viewer_loaded.emit(ok)
+
+    def set_max_fps(self, fps):
+        """Cap the viewer's frame rate; 0 renders at the display rate"""
+        self.max_fps = fps
+        self.web_view.page().runJavaScript(f"setMaxFps({float(fps or 0)})")
+
+    def set_quality(self, preset):
+        """Fix the render quality to 'low', 'medium' or 'high', or let 'auto' follow the frame time"""
+        if preset not in self.QUALITY_PRESETS:
+            raise ValueError(f"Unknown quality preset: {preset}")
+        self.quality = preset
+        self.web_view.page().runJavaScript(f"setQuality('{preset}')")
+
+    def play_lip_sync(self, track: bytes, start_ms: float):
+        """Hand a sentence's viseme track to the viewer, which plays it from start_ms on its own"""
+        self.model_controller.lip_sync.emit(base64.b64encode(track).decode('ascii'), LIP_SYNC_FRAME_MS, start_ms)
+
+    def stop_lip_sync(self):
+        self.model_controller.lip_sync_stopped.emit()
+
+    def set_avatar_model(self, model_path, preprocess=True):
+        """Load a GLB, using its preprocessed copy from the asset cache when there is one
+
+        On a cache miss the original file is shown right away and the model is
+        preprocessed in the background for the next start. Returns False if
+        the file does not exist.
+        """
+        if not os.path.exists(model_path):
             print(f"Model file not found: {model_path}")
+            return False
+
+        self.model_path = model_path
+        if preprocess:
+            if self.asset_cache is None:
+                self.asset_cache = AssetCache()
+            cached_path = self.asset_cache.lookup(model_path)
+            if cached_path is not None:
+                self.load_model_file(cached_path)
+                return True
+            if self.asset_worker is None or not self.asset_worker.isRunning():
+                self.asset_worker = AssetWorker(self.asset_cache, model_path)
+                self.asset_worker.finished.connect(self.on_model_preprocessed)
+                self.asset_worker.error.connect(self.on_preprocess_error)
+                self.asset_worker.start()
+        self.load_model_file(model_path)
+        return True
+
+    def load_model_file(self, path, use_cache=True):
+        """Show a GLB as it is; use_cache=False reparses it even if the viewer still holds it"""
+        model_url = QUrl.fromLocalFile(os.path.abspath(path)).toString()
+        js_code = f"loadModel('{model_url}', {'true' if use_cache else 'false'})"
+        self.web_view.page().runJavaScript(js_code)
+
+    def on_model_preprocessed(self, model_path, cached_path):
+        print(f"Avatar model cached: {model_path} -> {cached_path}")
+
+    def on_preprocess_error(self, model_path, message):
+        print(f"Could not preprocess {model_path}, using the original file: {message}")
 
     def set_background_image(self, image_path):
         """Set the background image for the viewer"""
@@ -51,8 +175,35 @@ class AvatarWidget(QWidget):
         else:
             print(f"Background image not found: {image_path}")
 
+    # Built viewer pages, shared by every AvatarWidget and keyed on what goes into them
+    _viewer_pages = {}
+
     def get_viewer_html(self):
-        return """
+        key = (self.quality, self.three_source, VIEWER_TEMPLATE_HASH)
+        html = AvatarWidget._viewer_pages.get(key)
+        if html is None:
+            html = AvatarWidget._viewer_pages[key] = self.build_viewer_html(self.quality, self.three_source)
+        return html
+
+    @staticmethod
+    def build_viewer_html(quality, three_source):
+        scripts = ''.join(f'\n    <script src="{url}"></script>' for url in THREE_SCRIPTS[three_source])
+        return (VIEWER_TEMPLATE.replace('{{three_source}}', three_source)
+                .replace('{{three_scripts}}', scripts)
+                .replace('{{quality}}', quality))
+
+
+MISSING_THREE_HTML = """
+<!DOCTYPE html>
+<html>
+<body style="margin: 0; background: #2a2a2a; color: #a0a0a0; font-family: sans-serif;">
+    <p style="padding: 20px;">The avatar viewer needs three.js r128 in web/vendor/three.
+    Run <code>python __vendor.py</code> to download it.</p>
+</body>
+</html>
+"""
+
+VIEWER_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -75,15 +226,28 @@ class AvatarWidget(QWidget):
 </head>
 <body>
     <div id="loading">Loading model...</div>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/GLTFLoader.js"></script>
+    <!-- Vendored copies, or the CDN when AI_ASSISTANT_THREE_CDN=1 and nothing is vendored -->
+    <script>window.threeSource = '{{three_source}}';</script>{{three_scripts}}
     <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
     
     <script>
         let scene, camera, renderer, controls, mixer, model;
         let loadingDiv;
         let backgroundTexture = null;
+        let animationPlaying = false;
+        const clock = new THREE.Clock();
+        const activeSources = new Set();
+        let frameScheduled = false;
+        let renderRequested = false;
+        let minFrameInterval = 0;
+        let lastFrameTime = 0;
+        let ambientLight, directionalLight;
+        const INITIAL_QUALITY = '{{quality}}';
+        let qualityAuto = true;
+        let qualityLevel = 1;
+        let frameSamples = [];
+        let lastQualityDrop = -Infinity;
+        let previousFrameBusy = false;
         
         function init() {
             loadingDiv = document.getElementById('loading');
@@ -94,26 +258,126 @@ class AvatarWidget(QWidget):
             camera = new THREE.PerspectiveCamera(60, window.innerWidth / window.innerHeight, 0.1, 1000);
             camera.position.set(0, 1.5, 3);
             
-            renderer = new THREE.WebGLRenderer({ antialias: true });
+            ambientLight = new THREE.AmbientLight(0xffffff, 0.5);
+            scene.add(ambientLight);
+            
+            directionalLight = new THREE.DirectionalLight(0xffffff, 1);
+            directionalLight.position.set(1, 1, 1);
+            directionalLight.shadow.mapSize.set(1024, 1024);
+            scene.add(directionalLight);
+            
+            // The preset chosen in Python is part of the page, so the first frame uses it
+            if (INITIAL_QUALITY !== 'auto') {
+                qualityAuto = false;
+                qualityLevel = QUALITY_LEVELS.indexOf(INITIAL_QUALITY);
+            }
+            applyQuality(QUALITY_LEVELS[qualityLevel]);
+            requestRender();
+            initWebChannel();
+        }
+
+        // Software WebGL pays for every pixel, sample and light, so each preset
+        // trades image quality for frame time. Antialiasing is fixed when the
+        // WebGL context is created; changing it rebuilds the renderer.
+        const QUALITY_PRESETS = {
+            low: { pixelRatio: 0.5, antialias: false, shadows: false, lights: 1 },
+            medium: { pixelRatio: 0.75, antialias: false, shadows: false, lights: 2 },
+            high: { pixelRatio: 1.0, antialias: true, shadows: true, lights: 2 }
+        };
+        const QUALITY_LEVELS = ['low', 'medium', 'high'];
+        
+        function createRenderer(antialias) {
+            const target = controls ? controls.target.clone() : new THREE.Vector3(0, 1, 0);
+            if (renderer) {
+                controls.dispose();
+                renderer.domElement.remove();
+                renderer.dispose();
+                renderer.forceContextLoss();
+            }
+            
+            renderer = new THREE.WebGLRenderer({ antialias: antialias });
             renderer.setSize(window.innerWidth, window.innerHeight);
             document.body.appendChild(renderer.domElement);
             
             controls = new THREE.OrbitControls(camera, renderer.domElement);
             controls.enableDamping = true;
             controls.dampingFactor = 0.05;
-            controls.target.set(0, 1, 0);
+            controls.target.copy(target);
+            controls.addEventListener('change', requestRender);
+        }
+        
+        function applyQuality(name) {
+            const preset = QUALITY_PRESETS[name];
+            if (!renderer || renderer.getContextAttributes().antialias !== preset.antialias) {
+                createRenderer(preset.antialias);
+            }
+            renderer.setPixelRatio(Math.min(window.devicePixelRatio || 1, 2) * preset.pixelRatio);
+            renderer.setSize(window.innerWidth, window.innerHeight);
             
-            const ambientLight = new THREE.AmbientLight(0xffffff, 0.5);
-            scene.add(ambientLight);
+            // One light is the ambient term alone, brightened to make up for the sun
+            directionalLight.visible = preset.lights > 1;
+            ambientLight.intensity = preset.lights > 1 ? 0.5 : 1.0;
             
-            const directionalLight = new THREE.DirectionalLight(0xffffff, 1);
-            directionalLight.position.set(1, 1, 1);
-            scene.add(directionalLight);
+            if (renderer.shadowMap.enabled !== preset.shadows) {
+                renderer.shadowMap.enabled = preset.shadows;
+                directionalLight.castShadow = preset.shadows;
+                // Materials compile shadow support in or out, so rebuild their programs
+                scene.traverse(function(object) {
+                    if (object.material) {
+                        [].concat(object.material).forEach(function(material) {
+                            material.needsUpdate = true;
+                        });
+                    }
+                });
+            }
+            frameSamples = [];
+            requestRender();
+        }
+        
+        function setQuality(name) {
+            if (name === 'auto') {
+                qualityAuto = true;
+            } else if (QUALITY_PRESETS[name]) {
+                qualityAuto = false;
+                qualityLevel = QUALITY_LEVELS.indexOf(name);
+                applyQuality(name);
+            }
+        }
+        
+        // Auto mode: collect the real interval between back-to-back frames and
+        // step the preset down when it misses the frame budget. Stepping up
+        // needs the budget met with the render call well inside it, and waits
+        // longer after a step down so the level does not flap.
+        function sampleFrame(interval, renderTime) {
+            if (!qualityAuto) return;
+            frameSamples.push([interval, renderTime]);
+            if (frameSamples.length < 60) return;
             
-            animate();
-            initWebChannel();
+            const average = function(index) {
+                return frameSamples.reduce(function(sum, sample) { return sum + sample[index]; }, 0) / frameSamples.length;
+            };
+            const frameTime = average(0);
+            const renderCost = average(1);
+            const budget = Math.max(minFrameInterval, 1000 / 60);
+            frameSamples = [];
+            
+            const now = performance.now();
+            let level = qualityLevel;
+            if (frameTime > budget * 1.3 && level > 0) {
+                level -= 1;
+                lastQualityDrop = now;
+            } else if (frameTime < budget * 1.1 && renderCost < budget * 0.35 &&
+                       level < QUALITY_LEVELS.length - 1 && now - lastQualityDrop > 30000) {
+                level += 1;
+            }
+            if (level !== qualityLevel) {
+                qualityLevel = level;
+                applyQuality(QUALITY_LEVELS[level]);
+                notify("Quality set to " + QUALITY_LEVELS[level] + " (frame time " +
+                    frameTime.toFixed(1) + " ms, budget " + budget.toFixed(1) + " ms)");
+            }
         }
-
+        
         function setBackgroundImage(url) {
             if (!url) return;
             
@@ -121,6 +385,10 @@ class AvatarWidget(QWidget):
             textureLoader.load(
                 url,
                 function(texture) {
+                    // The replaced background would otherwise stay on the GPU
+                    if (backgroundTexture && backgroundTexture !== texture) {
+                        backgroundTexture.dispose();
+                    }
                     scene.background = texture;
                     
                     // Adjust texture to cover the background properly
@@ -136,26 +404,42 @@ class AvatarWidget(QWidget):
                     }
                     
                     backgroundTexture = texture;
-                    if (window.controller) {
-                        window.controller.log("Background image loaded successfully");
-                    }
+                    requestRender();
+                    notify("Background image loaded successfully");
+                    reportMemory();
                 },
                 undefined,
                 function(error) {
                     console.error('Error loading background:', error);
-                    if (window.controller) {
-                        window.controller.log("Error loading background: " + error.message);
-                    }
+                    notify("Error loading background: " + error.message);
                 }
             );
         }
         
+        // Messages sent before the web channel is up, such as a cached model
+        // that finished loading first, wait here and go out once it connects
+        const pendingMessages = [];
+        
+        function notify(message) {
+            if (window.controller) {
+                window.controller.log(message);
+            } else {
+                pendingMessages.push(message);
+            }
+        }
+        
         function initWebChannel() {
             if (typeof qt !== 'undefined' && qt.webChannelTransport) {
                 new QWebChannel(qt.webChannelTransport, function(channel) {
                     window.controller = channel.objects.controller;
                     if (window.controller) {
-                        window.controller.log("Viewer initialized");
+                        window.controller.lip_sync.connect(startLipSync);
+                        window.controller.lip_sync_stopped.connect(stopLipSync);
+                        window.controller.log("Viewer initialized in " + Math.round(performance.now()) +
+                            " ms (three.js r" + THREE.REVISION + " from " + window.threeSource + ")");
+                        pendingMessages.splice(0).forEach(function(message) {
+                            window.controller.log(message);
+                        });
                     }
                 });
             } else {
@@ -163,50 +447,249 @@ class AvatarWidget(QWidget):
             }
         }
         
-        function loadModel(url) {
-            if (!url) return;
+        // Recently shown models stay parsed and uploaded so switching back to
+        // one is instant; a model that falls out of the cache is disposed.
+        const MODEL_CACHE_SIZE = 3;
+        const modelCache = new Map();
+        let loadToken = 0;
+        
+        function disposeMaterial(material) {
+            Object.keys(material).forEach(function(key) {
+                const value = material[key];
+                if (value && value.isTexture) {
+                    value.dispose();
+                }
+            });
+            material.dispose();
+        }
+        
+        function disposeObject(root) {
+            root.traverse(function(object) {
+                if (object.geometry) {
+                    object.geometry.dispose();
+                }
+                if (object.material) {
+                    [].concat(object.material).forEach(disposeMaterial);
+                }
+                if (object.isSkinnedMesh) {
+                    object.skeleton.dispose();
+                }
+            });
+        }
+        
+        function evictModel(url) {
+            const entry = modelCache.get(url);
+            modelCache.delete(url);
+            if (entry.scene === model) {
+                scene.remove(model);
+                model = null;
+                mixer = null;
+                mouthTargets = [];
+                animationPlaying = false;
+            }
+            if (entry.mixer) {
+                entry.mixer.stopAllAction();
+                entry.mixer.uncacheRoot(entry.scene);
+            }
+            disposeObject(entry.scene);
+        }
+        
+        function cacheModel(url, entry) {
+            modelCache.delete(url);
+            modelCache.set(url, entry);
+            // Evict least recently used first, but never the model on screen
+            for (const [oldUrl, oldEntry] of modelCache) {
+                if (modelCache.size <= MODEL_CACHE_SIZE) break;
+                if (oldEntry.scene !== model) {
+                    evictModel(oldUrl);
+                }
+            }
+        }
+        
+        function prepareModel(gltf) {
+            const root = gltf.scene;
+            root.traverse(function(object) {
+                if (object.isMesh) {
+                    object.castShadow = true;
+                    object.receiveShadow = true;
+                }
+            });
             
-            loadingDiv.style.display = 'block';
+            const box = new THREE.Box3().setFromObject(root);
+            const center = box.getCenter(new THREE.Vector3());
+            const size = box.getSize(new THREE.Vector3());
+            const maxDim = Math.max(size.x, size.y, size.z);
+            const scale = 2 / maxDim;
+            
+            root.scale.multiplyScalar(scale);
+            root.position.sub(center.multiplyScalar(scale));
             
+            const distance = Math.max(size.y * scale * 1.5, 2);
+            return {
+                scene: root,
+                animations: gltf.animations || [],
+                mixer: gltf.animations && gltf.animations.length ? new THREE.AnimationMixer(root) : null,
+                cameraPosition: new THREE.Vector3(0, size.y * scale * 0.8, distance), // Adjusted height multiplier
+                target: new THREE.Vector3(0, size.y * scale * 0.6, 0) // Adjusted target height
+            };
+        }
+        
+        function showModel(entry) {
             if (model) {
                 scene.remove(model);
                 if (mixer) {
                     mixer.stopAllAction();
-                    mixer.uncacheRoot(model);
                 }
             }
+            model = entry.scene;
+            mixer = entry.mixer;
+            scene.add(model);
+            
+            animationPlaying = false;
+            if (mixer) {
+                mixer.clipAction(entry.animations[0]).reset().play();
+                animationPlaying = true;
+                scheduleFrame();
+            }
+            
+            camera.position.copy(entry.cameraPosition);
+            controls.target.copy(entry.target);
+            controls.update();
+            
+            mouthTargets = findMouthTargets(model);
+            if (!mouthTargets.length) {
+                notify("Model has no mouth morph targets, lip sync is off");
+            }
+        }
+        
+        // Lip sync. Each sentence's track arrives once with its playback start
+        // time; every drawn frame looks up the mouth pose for the current time
+        // locally. Date.now() shares its epoch with Python's time.time().
+        const MOUTH_MORPHS = {
+            open: ['jawOpen', 'mouthOpen', 'viseme_aa'],
+            wide: ['viseme_E', 'viseme_I'],
+            round: ['viseme_O', 'viseme_U']
+        };
+        let lipSync = null;
+        let mouthTargets = [];
+        
+        function findMouthTargets(root) {
+            const targets = [];
+            root.traverse(function(object) {
+                const dictionary = object.morphTargetDictionary;
+                if (!dictionary) return;
+                const target = { influences: object.morphTargetInfluences };
+                Object.keys(MOUTH_MORPHS).forEach(function(role) {
+                    const name = MOUTH_MORPHS[role].find(function(name) { return name in dictionary; });
+                    target[role] = name === undefined ? -1 : dictionary[name];
+                });
+                if (target.open >= 0 || target.wide >= 0 || target.round >= 0) {
+                    targets.push(target);
+                }
+            });
+            return targets;
+        }
+        
+        function setMouth(open, wide) {
+            mouthTargets.forEach(function(target) {
+                if (target.open >= 0) target.influences[target.open] = open * 0.7;
+                if (target.wide >= 0) target.influences[target.wide] = open * wide * 0.6;
+                if (target.round >= 0) target.influences[target.round] = open * (1 - wide) * 0.6;
+            });
+        }
+        
+        function startLipSync(track, frameMs, startMs) {
+            const binary = atob(track);
+            const frames = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) {
+                frames[i] = binary.charCodeAt(i);
+            }
+            lipSync = { frames: frames, frameMs: frameMs, start: startMs };
+            setActive('speech', true);
+        }
+        
+        function stopLipSync() {
+            lipSync = null;
+            setMouth(0, 0);
+            setActive('speech', false);
+            requestRender();
+        }
+        
+        function updateLipSync() {
+            if (!lipSync) return;
+            const frames = lipSync.frames;
+            const count = frames.length / 2;
+            const position = (Date.now() - lipSync.start) / lipSync.frameMs;
+            if (position >= count) {
+                stopLipSync();
+                return;
+            }
+            if (position < 0) {
+                setMouth(0, 0);
+                return;
+            }
+            // Blend neighbouring frames so the steps do not show above 50 fps
+            const index = Math.floor(position);
+            const next = Math.min(index + 1, count - 1);
+            const blend = position - index;
+            const open = (frames[2 * index] * (1 - blend) + frames[2 * next] * blend) / 255;
+            const wide = (frames[2 * index + 1] * (1 - blend) + frames[2 * next + 1] * blend) / 255;
+            setMouth(open, wide);
+        }
+        
+        function reportMemory() {
+            const info = renderer.info;
+            let message = "Memory: " + info.memory.geometries + " geometries, " +
+                info.memory.textures + " textures, " + info.programs.length + " programs, " +
+                modelCache.size + " cached models";
+            if (performance.memory) {
+                message += ", JS heap " + (performance.memory.usedJSHeapSize / 1048576).toFixed(1) + " MB";
+            }
+            notify(message);
+        }
+        
+        function loadModel(url, useCache) {
+            if (!url) return;
+            
+            const loadStarted = performance.now();
+            const token = ++loadToken;
+            
+            if (useCache === false && modelCache.has(url)) {
+                evictModel(url);
+            }
+            const cached = modelCache.get(url);
+            if (cached) {
+                cacheModel(url, cached);
+                showModel(cached);
+                loadingDiv.style.display = 'none';
+                requestRender();
+                notify("Model loaded from cache in " +
+                    Math.round(performance.now() - loadStarted) + " ms");
+                reportMemory();
+                return;
+            }
+            
+            loadingDiv.style.display = 'block';
             
             const loader = new THREE.GLTFLoader();
             loader.load(
                 url,
                 function(gltf) {
-                    model = gltf.scene;
-                    scene.add(model);
-                    
-                    if (gltf.animations && gltf.animations.length) {
-                        mixer = new THREE.AnimationMixer(model);
-                        const action = mixer.clipAction(gltf.animations[0]);
-                        action.play();
+                    const entry = prepareModel(gltf);
+                    cacheModel(url, entry);
+                    // A newer loadModel() call has taken over; keep this one warm only
+                    if (token !== loadToken) {
+                        return;
                     }
-                    
-                    const box = new THREE.Box3().setFromObject(model);
-                    const center = box.getCenter(new THREE.Vector3());
-                    const size = box.getSize(new THREE.Vector3());
-                    const maxDim = Math.max(size.x, size.y, size.z);
-                    const scale = 2 / maxDim;
-                    
-                    model.scale.multiplyScalar(scale);
-                    model.position.sub(center.multiplyScalar(scale));
-                    
-                    const distance = Math.max(size.y * scale * 1.5, 2);
-                    camera.position.set(0, size.y * scale * 0.8, distance); // Adjusted height multiplier
-                    controls.target.set(0, size.y * scale * 0.6, 0); // Adjusted target height
-                    controls.update();
+                    showModel(entry);
                     
                     loadingDiv.style.display = 'none';
-                    if (window.controller) {
-                        window.controller.log("Model loaded successfully");
-                    }
+                    // Draw once so texture and buffer uploads count towards the load time
+                    renderer.render(scene, camera);
+                    requestRender();
+                    notify("Model loaded successfully in " +
+                        Math.round(performance.now() - loadStarted) + " ms");
+                    reportMemory();
                 },
                 function(xhr) {
                     const percent = (xhr.loaded / xhr.total * 100).toFixed(2);
@@ -215,20 +698,77 @@ class AvatarWidget(QWidget):
                 function(error) {
                     loadingDiv.style.display = 'none';
                     console.error('Error loading model:', error);
-                    if (window.controller) {
-                        window.controller.log("Error loading model: " + error.message);
-                    }
+                    notify("Error loading model: " + error.message);
                 }
             );
         }
         
-        function animate() {
-            requestAnimationFrame(animate);
-            controls.update();
-            if (mixer) {
-                mixer.update(0.016);
+        // Frames are drawn on demand. The loop keeps running only while the
+        // controls are still settling, an animation is playing or a named
+        // source (such as speech) holds it open; otherwise it sleeps until
+        // requestRender() is called.
+        function requestRender() {
+            renderRequested = true;
+            scheduleFrame();
+        }
+        
+        function scheduleFrame() {
+            if (!frameScheduled) {
+                frameScheduled = true;
+                requestAnimationFrame(animate);
+            }
+        }
+        
+        function setActive(source, active) {
+            if (active) {
+                activeSources.add(source);
+                scheduleFrame();
+            } else {
+                activeSources.delete(source);
+            }
+        }
+        
+        function setMaxFps(fps) {
+            minFrameInterval = fps > 0 ? 1000 / fps : 0;
+            requestRender();
+        }
+        
+        function animate(now) {
+            frameScheduled = false;
+            // Under an FPS cap, let vsyncs pass until the frame interval is up
+            if (minFrameInterval && now - lastFrameTime < minFrameInterval - 1) {
+                scheduleFrame();
+                return;
+            }
+            const previousFrameTime = lastFrameTime;
+            lastFrameTime = now;
+            
+            // Real elapsed time, clamped so a stalled page does not jump the animation
+            const delta = Math.min(clock.getDelta(), 0.1);
+            const moving = controls.update();
+            if (mixer && animationPlaying) {
+                mixer.update(delta);
+            }
+            updateLipSync();
+            
+            const busy = moving || animationPlaying || activeSources.size > 0;
+            if (busy || renderRequested) {
+                const renderStarted = performance.now();
+                renderer.render(scene, camera);
+                // Only back-to-back frames say anything about the frame time
+                if (previousFrameBusy && busy) {
+                    sampleFrame(now - previousFrameTime, performance.now() - renderStarted);
+                }
+            }
+            renderRequested = false;
+            previousFrameBusy = busy;
+            
+            if (busy) {
+                scheduleFrame();
+            } else {
+                // Restarted by the next getDelta(), so idle time is not counted
+                clock.stop();
             }
-            renderer.render(scene, camera);
         }
         
         function handleResize() {
@@ -249,6 +789,7 @@ class AvatarWidget(QWidget):
                     backgroundTexture.offset.set((1 - backgroundTexture.repeat.x) / 2, 0);
                 }
             }
+            requestRender();
         }
         
         window.addEventListener('resize', handleResize);
@@ -257,6 +798,8 @@ class AvatarWidget(QWidget):
 </body>
 </html>
 """
+VIEWER_TEMPLATE_HASH = hashlib.sha1(VIEWER_TEMPLATE.encode('utf-8')).hexdigest()
+
 
 # Example usage:
 if __name__ == "__main__":
@@ -268,11 +811,10 @@ if __name__ == "__main__":
     widget.resize(800, 600)
     widget.show()
     
-    # Load background and model after a short delay (for testing)
-    from PyQt5.QtCore import QTimer
-    def load_test_content():
+    # Load background and model as soon as the viewer page is ready
+    def load_test_content(ok):
         widget.set_background_image("background.jpeg")  # Replace with your background image path
         widget.set_avatar_model("models/chloe.glb")  # Replace with your model path
-    QTimer.singleShot(1000, load_test_content)
+    widget.viewer_loaded.connect(load_test_content)
     
     sys.exit(app.exec_())
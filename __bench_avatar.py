@@ -0,0 +1,107 @@
+import re
+import sys
+import glob
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from __asset_cache import AssetCache
+
+# Benchmark for avatar loading.
+# Preprocesses each model into a scratch cache and reports the file sizes and the
+# preprocessing time, then loads the original and the preprocessed GLB in the
+# viewer in turn and reports the time GLTFLoader takes until the first frame is
+# drawn ("Model loaded successfully in N ms" from the page).
+
+LOADED = re.compile(r"Model loaded successfully in (\d+) ms")
+
+
+def wait_for(app, condition, timeout_s):
+    deadline = time.perf_counter() + timeout_s
+    while not condition() and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def viewer_load_times(models, repeat, timeout_s):
+    """Load each path `repeat` times in one AvatarWidget; returns {path: [ms, ...]}"""
+    from PyQt5.QtWidgets import QApplication
+    from __avatar import AvatarWidget
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    widget = AvatarWidget()
+    widget.resize(800, 600)
+    widget.show()
+
+    messages = []
+    widget.model_controller.message.connect(messages.append)
+    if not wait_for(app, lambda: any(m.startswith("Viewer initialized") for m in messages), timeout_s):
+        raise RuntimeError("viewer did not start")
+
+    times = {path: [] for path in models}
+    # Alternate between the files so both see the same warm browser state
+    for _ in range(repeat):
+        for path in models:
+            messages.clear()
+            # Bypass the viewer's model cache so every load is a cold parse
+            widget.load_model_file(path, use_cache=False)
+            if not wait_for(app, lambda: any(m.startswith(("Model loaded", "Error loading model"))
+                                             for m in messages), timeout_s):
+                raise RuntimeError(f"timed out loading {path}")
+            for message in messages:
+                match = LOADED.match(message)
+                if match:
+                    times[path].append(float(match.group(1)))
+    widget.close()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark avatar loading before and after preprocessing")
+    parser.add_argument('models', nargs='*', help="GLB files (default: models/*.glb)")
+    parser.add_argument('--repeat', type=int, default=5, help="Viewer loads per file (median is kept)")
+    parser.add_argument('--timeout', type=float, default=60, help="Seconds to wait for the viewer")
+    parser.add_argument('--no-viewer', action='store_true', help="Only measure preprocessing")
+    args = parser.parse_args()
+
+    models = args.models or sorted(glob.glob('models/*.glb'))
+    if not models:
+        print("No models to benchmark")
+        return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AssetCache(directory)
+        prepared = {}
+        print(f"{'model':<24} {'original KiB':>12} {'cached KiB':>11} {'ratio':>6} {'prepare (s)':>12}")
+        for model in models:
+            start = time.perf_counter()
+            prepared[model] = str(cache.prepare(model))
+            elapsed = time.perf_counter() - start
+            before = Path(model).stat().st_size
+            after = Path(prepared[model]).stat().st_size
+            print(f"{Path(model).name:<24} {before / 1024:>12.0f} {after / 1024:>11.0f} "
+                  f"{before / after:>5.1f}x {elapsed:>12.3f}")
+
+        if args.no_viewer:
+            return 0
+
+        paths = [path for model in models for path in (model, prepared[model])]
+        times = viewer_load_times(paths, args.repeat, args.timeout)
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2] if values else float('nan')
+
+    print()
+    print(f"{'model':<24} {'original (ms)':>14} {'cached (ms)':>12} {'speedup':>8}")
+    for model in models:
+        before = median(times[model])
+        after = median(times[prepared[model]])
+        print(f"{Path(model).name:<24} {before:>14.0f} {after:>12.0f} {before / after:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,515 @@
+import os
+import sys
+import json
+import time
+import wave
+import types
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+# End-to-end latency benchmark.
+# Starts the real AIAssistantApp headless against a local stand-in for the Ollama
+# server and a deterministic fake pyttsx3 engine, types a few questions into it,
+# and follows each turn through OllamaWorker -> handle_ollama_response ->
+# VoiceWorker -> PcmPlayer. Prints (or writes) the results as JSON; pass an
+# earlier result with --baseline to see what changed.
+#
+#   python __bench_e2e.py --turns 5 --tokens-per-second 40 --output run.json
+
+SAMPLE_RATE = 22050
+
+# Settings for the fake engine; it runs in the TTS process, so they travel as
+# environment variables
+TTS_CHARS_PER_SECOND_ENV = 'AI_ASSISTANT_BENCH_TTS_CPS'
+TTS_REALTIME_FACTOR_ENV = 'AI_ASSISTANT_BENCH_TTS_RTF'
+
+PROMPTS = [
+    "What is the capital of France?",
+    "Explain how a rainbow forms.",
+    "Give me three tips for sleeping better.",
+    "How does a refrigerator keep food cold?",
+    "What should I pack for a weekend hike?",
+]
+
+WORDS = ("the assistant reads the question and answers it in plain words with short "
+         "clear sentences so that every reply is easy to follow when spoken aloud").split()
+
+
+class FakeVoice:
+    def __init__(self, index):
+        self.id = f"bench-voice-{index}"
+
+
+class FakeEngine:
+    """Deterministic pyttsx3 stand-in: a voiced tone whose length follows the text
+
+    runAndWait() sleeps for realtime_factor seconds per second of audio to
+    stand in for the synthesis cost of a real engine.
+    """
+
+    def __init__(self, chars_per_second=14.0, realtime_factor=0.1):
+        self.chars_per_second = chars_per_second
+        self.realtime_factor = realtime_factor
+        self.properties = {'voices': [FakeVoice(i) for i in range(3)], 'rate': 160, 'volume': 1.0}
+        self.jobs = []
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def save_to_file(self, text, path):
+        self.jobs.append((text, path))
+
+    def runAndWait(self):
+        for text, path in self.jobs:
+            seconds = max(len(text) / self.chars_per_second, 0.2)
+            samples = self.speech(seconds)
+            time.sleep(seconds * self.realtime_factor)
+            with wave.open(path, 'wb') as output:
+                output.setnchannels(1)
+                output.setsampwidth(2)
+                output.setframerate(SAMPLE_RATE)
+                output.writeframes(samples.tobytes())
+        self.jobs = []
+
+    @staticmethod
+    def speech(seconds):
+        """Gliding harmonic tone with syllable-rate bursts, like __bench_voice uses"""
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        phase = 2 * np.pi * np.cumsum(180 + 30 * np.sin(2 * np.pi * 0.7 * t)) / SAMPLE_RATE
+        voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+        return (voice * envelope * 6000).astype(np.int16)
+
+    def stop(self):
+        pass
+
+
+def install_fake_tts():
+    module = types.ModuleType('pyttsx3')
+    module.init = lambda *args, **kwargs: FakeEngine(
+        float(os.environ.get(TTS_CHARS_PER_SECOND_ENV, 14)),
+        float(os.environ.get(TTS_REALTIME_FACTOR_ENV, 0.1)))
+    sys.modules['pyttsx3'] = module
+
+
+# The TTS process is spawned and imports this script again as __mp_main__, so
+# the fake engine has to be installed at import time to reach it
+install_fake_tts()
+
+
+def reply_tokens(length, seed=0):
+    """Deterministic reply of `length` tokens with a sentence break every 12 tokens"""
+    tokens = []
+    for i in range(length):
+        word = WORDS[(i * 7 + seed * 3) % len(WORDS)]
+        end = (i + 1) % 12 == 0 or i == length - 1
+        tokens.append((' ' if i else '') + word + ('.' if end else ''))
+    return tokens
+
+
+class MockOllama:
+    """Local HTTP server that answers /api/chat like Ollama, at a fixed token rate
+
+    Every request waits prefill_ms before the first token, then streams one
+    token every 1 / tokens_per_second seconds. Each request gets a different
+    reply, so the TTS cache does not hide synthesis in later turns.
+    """
+
+    def __init__(self, tokens_per_second=30.0, length=120, prefill_ms=150.0):
+        self.tokens_per_second = tokens_per_second
+        self.length = length
+        self.prefill_ms = prefill_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path != '/api/chat':
+                    self.send_error(404)
+                    return
+                try:
+                    mock.chat(self, request)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream, e.g. a pre-empted turn
+                    self.close_connection = True
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def chat(self, handler, request):
+        with self._lock:
+            seed = self.requests
+            self.requests += 1
+
+        length = self.length
+        num_predict = (request.get('options') or {}).get('num_predict')
+        if num_predict and num_predict > 0:
+            length = min(length, num_predict)
+        tokens = reply_tokens(length, seed)
+        model = request.get('model', 'bench')
+
+        def message(content, done):
+            chunk = {
+                'model': model,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'message': {'role': 'assistant', 'content': content},
+                'done': done,
+            }
+            if done:
+                chunk.update({'done_reason': 'stop', 'eval_count': len(tokens)})
+            return json.dumps(chunk).encode('utf-8') + b'\n'
+
+        time.sleep(self.prefill_ms / 1000)
+        interval = 1 / self.tokens_per_second
+
+        if not request.get('stream', True):
+            time.sleep(interval * len(tokens))
+            body = message(''.join(tokens), True)
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/x-ndjson')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+
+        def send(data):
+            handler.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            handler.wfile.flush()
+
+        next_token = time.perf_counter()
+        for token in tokens:
+            # Pace against a schedule so slow writes do not lower the rate
+            next_token += interval
+            time.sleep(max(next_token - time.perf_counter(), 0))
+            send(message(token, False))
+        send(message('', True))
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+
+class StallMonitor:
+    """Measures how late a short GUI-thread timer fires; lateness is time the event loop was blocked"""
+
+    def __init__(self, interval_ms=5):
+        from PyQt5.QtCore import QTimer
+
+        self.interval = interval_ms / 1000
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+        self.last = None
+        self.stalls = []
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.stalls.append(max(now - self.last - self.interval, 0.0))
+        self.last = now
+
+    def take(self):
+        """Stalls since the last call, in seconds"""
+        stalls, self.stalls = self.stalls, []
+        return stalls
+
+
+def wrap(obj, name, probe):
+    """Call probe(*args) before every call of obj.name made through the instance"""
+    original = getattr(obj, name)
+
+    def wrapper(*args):
+        probe(*args)
+        return original(*args)
+
+    setattr(obj, name, wrapper)
+
+
+class TurnProbe:
+    """Drives the window through the prompts and records when each stage is reached"""
+
+    def __init__(self, app, window, prompts, turns, stall_threshold_ms, timeout_s, pause_ms):
+        from PyQt5.QtCore import QTimer
+
+        self.app = app
+        self.window = window
+        self.prompts = prompts
+        self.count = turns
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.timeout_s = timeout_s
+        self.pause_ms = pause_ms
+        self.turns = []
+        self.current = None
+        self.started = False
+        self.error = None
+        self.monitor = StallMonitor()
+        self._effects_lock = threading.Lock()
+
+        self.watchdog = QTimer()
+        self.watchdog.setSingleShot(True)
+        self.watchdog.timeout.connect(self.on_timeout)
+
+        wrap(window, 'handle_ollama_token', self.on_token)
+        wrap(window, 'handle_ollama_response', self.on_response)
+        wrap(window, 'handle_ollama_error', self.on_error)
+        wrap(window, 'handle_voice_ready', self.on_segment)
+        wrap(window, 'handle_voice_finished', self.on_voice_finished)
+        wrap(window, 'handle_voice_error', self.on_error)
+        wrap(window, 'mark_startup', self.on_startup)
+        window.audio_player.started.connect(self.on_audio_started)
+
+        # Effects run on the voice thread; time them there
+        handler = window.voice_handler
+        apply_voice_effects = handler.apply_voice_effects
+
+        def timed_effects(buffer, sample_rate):
+            start = time.perf_counter()
+            result = apply_voice_effects(buffer, sample_rate)
+            with self._effects_lock:
+                if self.current is not None:
+                    self.current['effects_seconds'] += time.perf_counter() - start
+                    self.current['audio_seconds'] += len(buffer) / sample_rate
+            return result
+
+        handler.apply_voice_effects = timed_effects
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.current['submitted']) * 1000
+
+    def on_startup(self, phase):
+        # mark_startup runs after this probe; check on the next loop iteration
+        from PyQt5.QtCore import QTimer
+        QTimer.singleShot(0, self.maybe_begin)
+
+    def maybe_begin(self):
+        if not self.started and self.window.startup.reported:
+            self.begin()
+
+    def begin(self):
+        if self.started:
+            return
+        self.started = True
+        self.monitor.start()
+        self.start_turn()
+
+    def start_turn(self):
+        if len(self.turns) == self.count:
+            self.app.quit()
+            return
+
+        self.window.audio_player.stop()
+        self.monitor.take()
+        prompt = self.prompts[len(self.turns) % len(self.prompts)]
+        with self._effects_lock:
+            self.current = {
+                'prompt': prompt,
+                'submitted': time.perf_counter(),
+                'effects_seconds': 0.0,
+                'audio_seconds': 0.0,
+            }
+        self.watchdog.start(int(self.timeout_s * 1000))
+        self.window.input_bar.setText(prompt)
+        self.window.process_text_input()
+
+    def on_token(self, *args):
+        self.current.setdefault('ttft_ms', self.elapsed_ms())
+
+    def on_response(self, *args):
+        self.current['reply_ms'] = self.elapsed_ms()
+
+    def on_segment(self, *args):
+        self.current.setdefault('first_segment_ms', self.elapsed_ms())
+
+    def on_audio_started(self):
+        if self.current is not None:
+            self.current.setdefault('first_audio_ms', self.elapsed_ms())
+
+    def on_voice_finished(self, *args):
+        if self.current is None or 'reply_ms' not in self.current:
+            return
+        self.current['voice_done_ms'] = self.elapsed_ms()
+        self.finish_turn()
+
+    def on_error(self, message, *args):
+        self.error = f"turn {len(self.turns) + 1}: {message}"
+        self.app.quit()
+
+    def on_timeout(self):
+        self.error = f"turn {len(self.turns) + 1} did not finish within {self.timeout_s:.0f} s"
+        self.app.quit()
+
+    def finish_turn(self):
+        from PyQt5.QtCore import QTimer
+
+        self.watchdog.stop()
+        stalls = np.array(self.monitor.take() or [0.0])
+        turn = dict(self.current)
+        del turn['submitted']
+        audio = turn['audio_seconds']
+        turn['effects_ms_per_audio_s'] = turn['effects_seconds'] * 1000 / audio if audio else None
+        turn['gui_stall_max_ms'] = float(stalls.max() * 1000)
+        turn['gui_stall_p99_ms'] = float(np.percentile(stalls, 99) * 1000)
+        turn['gui_stall_total_ms'] = float(stalls[stalls > self.stall_threshold].sum() * 1000)
+        self.turns.append(turn)
+        with self._effects_lock:
+            self.current = None
+        QTimer.singleShot(self.pause_ms, self.start_turn)
+
+
+SUMMARY_METRICS = [
+    'ttft_ms', 'reply_ms', 'first_segment_ms', 'first_audio_ms', 'voice_done_ms',
+    'effects_ms_per_audio_s', 'gui_stall_max_ms', 'gui_stall_p99_ms', 'gui_stall_total_ms',
+]
+
+
+def summarize(turns):
+    summary = {}
+    for metric in SUMMARY_METRICS:
+        values = [turn[metric] for turn in turns if turn.get(metric) is not None]
+        if values:
+            summary[metric] = float(np.median(values))
+    return summary
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f).get('summary', {})
+    lines = [f"{'metric':<24} {'baseline':>10} {'this run':>10} {'change':>8}"]
+    for metric, value in result['summary'].items():
+        before = baseline.get(metric)
+        if before is None:
+            continue
+        change = f"{(value - before) / before:+.0%}" if before else ''
+        lines.append(f"{metric:<24} {before:>10.1f} {value:>10.1f} {change:>8}")
+    return "\n".join(lines)
+
+
+def run(args):
+    origin = time.perf_counter()
+    server = MockOllama(args.tokens_per_second, args.tokens, args.prefill_ms).start()
+    os.environ['OLLAMA_HOST'] = server.url
+    os.environ[TTS_CHARS_PER_SECOND_ENV] = str(args.tts_chars_per_second)
+    os.environ[TTS_REALTIME_FACTOR_ENV] = str(args.tts_realtime_factor)
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ.setdefault('QTWEBENGINE_CHROMIUM_FLAGS', '--disable-gpu')
+
+    cache_dir = None
+    if not args.warm_cache:
+        # Fresh TTS and avatar caches, so every sentence goes through synthesis and effects
+        cache_dir = tempfile.TemporaryDirectory()
+        os.environ['XDG_CACHE_HOME'] = cache_dir.name
+
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from __startup import StartupProfile
+    import __main as assistant
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = assistant.AIAssistantApp(StartupProfile(origin))
+    probe = TurnProbe(app, window, PROMPTS, args.turns, args.stall_threshold_ms, args.timeout, args.pause_ms)
+    window.show()
+    # Start anyway if some start-up phase never reports, e.g. without WebGL
+    QTimer.singleShot(int(args.startup_timeout * 1000), probe.begin)
+
+    try:
+        app.exec_()
+    finally:
+        window.close()
+        server.stop()
+        if cache_dir is not None:
+            cache_dir.cleanup()
+
+    return {
+        'config': vars(args),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'revision': revision(),
+        },
+        'startup_ms': {phase: seconds * 1000 for phase, seconds in window.startup.marks},
+        'error': probe.error,
+        'turns': probe.turns,
+        'summary': summarize(probe.turns),
+        'stalls': window.watchdog.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark with a mock Ollama server and fake TTS")
+    parser.add_argument('--turns', type=int, default=3, help="Questions to ask")
+    parser.add_argument('--tokens', type=int, default=120, help="Reply length in tokens")
+    parser.add_argument('--tokens-per-second', type=float, default=30, help="Generation speed of the mock server")
+    parser.add_argument('--prefill-ms', type=float, default=150, help="Delay before the first token")
+    parser.add_argument('--tts-chars-per-second', type=float, default=14, help="Speaking rate of the fake engine")
+    parser.add_argument('--tts-realtime-factor', type=float, default=0.1,
+                        help="Fake synthesis time per second of audio")
+    parser.add_argument('--stall-threshold-ms', type=float, default=50,
+                        help="GUI stalls longer than this count towards gui_stall_total_ms")
+    parser.add_argument('--pause-ms', type=int, default=500, help="Idle time between turns")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds allowed per turn")
+    parser.add_argument('--startup-timeout', type=float, default=30,
+                        help="Start the turns after this many seconds even if start-up has not finished")
+    parser.add_argument('--warm-cache', action='store_true', help="Keep the user's TTS and avatar caches")
+    parser.add_argument('--output', help="Write the JSON result here instead of stdout")
+    parser.add_argument('--baseline', help="Earlier JSON result to compare the medians with")
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        print(compare(result, args.baseline), file=sys.stderr)
+    return 1 if result['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
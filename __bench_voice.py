@@ -0,0 +1,120 @@
+import sys
+import time
+import argparse
+import numpy as np
+from pydub import AudioSegment
+
+from __voice import VoiceHandler
+from __effects import pitch_wobble, default_voice_effects, to_float32, to_int16
+
+# Benchmark for the voice effects path.
+# Compares the old 500 ms chunk loop (one librosa pitch_shift per chunk, joined
+# with sum()) against the single-pass pitch_wobble() on the same audio, then the
+# old pydub effects path against the float32 EffectChain.
+
+SAMPLE_RATE = 22050
+
+
+def synthetic_speech(seconds, sample_rate=SAMPLE_RATE):
+    """Voice-like test signal: a gliding harmonic tone with syllable-rate bursts"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 180 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    return (voice * envelope * 6000).astype(np.float32)
+
+
+def to_segment(samples, sample_rate=SAMPLE_RATE):
+    return AudioSegment(
+        np.clip(samples, -32768, 32767).astype(np.int16).tobytes(),
+        frame_rate=sample_rate,
+        sample_width=2,
+        channels=1
+    )
+
+
+def legacy_wobble(handler, audio):
+    """The chunked pitch shift that apply_voice_effects used to run"""
+    segments = []
+    chunk_size = 500
+
+    for i in range(0, len(audio), chunk_size):
+        chunk = audio[i:i+chunk_size]
+        pitch_shift_amount = np.sin(i / 100) * 0.1
+        segments.append(handler.pitch_shift(chunk, pitch_shift_amount))
+
+    return sum(segments[1:], segments[0])
+
+
+def legacy_reverb(audio, delay_ms, decay):
+    """The pydub overlay reverb that apply_voice_effects used to run"""
+    reverb_sound = audio.fade_out(int(delay_ms))
+    for i in range(2):
+        delay = int((i + 1) * delay_ms)
+        echo = audio._spawn(audio.raw_data)
+        echo = echo - (decay * (i + 1))
+        reverb_sound = reverb_sound.overlay(echo, position=delay)
+    return reverb_sound
+
+
+def legacy_effects(handler, audio):
+    modified = legacy_wobble(handler, audio)
+    modified = legacy_reverb(modified, delay_ms=20, decay=0.05)
+    return modified.high_pass_filter(1000)
+
+
+def chain_effects(chain, audio):
+    samples = np.array(audio.get_array_of_samples(), dtype=np.int16)
+    buffer = chain.process(to_float32(samples), audio.frame_rate)
+    return to_int16(buffer).tobytes()
+
+
+def vectorized_wobble(audio):
+    samples = np.array(audio.get_array_of_samples()).astype(np.float32)
+    return to_segment(pitch_wobble(samples, audio.frame_rate), audio.frame_rate)
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voice pitch wobble")
+    parser.add_argument('--seconds', type=float, nargs='+', default=[5, 15, 60],
+                        help="Clip lengths to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    handler = VoiceHandler(tts_service=None)
+    # Warm up librosa (numba JIT, resampler tables) so it is not billed to the first clip
+    legacy_wobble(handler, to_segment(synthetic_speech(1)))
+
+    print(f"{'clip (s)':>8} {'chunked (s)':>12} {'one pass (s)':>13} {'speedup':>8}")
+
+    for seconds in args.seconds:
+        audio = to_segment(synthetic_speech(seconds))
+        legacy = best_time(lambda: legacy_wobble(handler, audio), args.repeat)
+        vectorized = best_time(lambda: vectorized_wobble(audio), args.repeat)
+        print(f"{seconds:>8.1f} {legacy:>12.3f} {vectorized:>13.4f} {legacy / vectorized:>7.0f}x")
+
+    # Whole effects path; the real-time factor is processing time per second of audio
+    chain = default_voice_effects()
+    print()
+    print(f"{'clip (s)':>8} {'pydub (s)':>10} {'chain (s)':>10} {'speedup':>8} {'chain RTF':>10}")
+
+    for seconds in args.seconds:
+        audio = to_segment(synthetic_speech(seconds))
+        legacy = best_time(lambda: legacy_effects(handler, audio), args.repeat)
+        vectorized = best_time(lambda: chain_effects(chain, audio), args.repeat)
+        print(f"{seconds:>8.1f} {legacy:>10.3f} {vectorized:>10.4f} {legacy / vectorized:>7.0f}x "
+              f"{vectorized / seconds:>10.5f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
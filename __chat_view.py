@@ -0,0 +1,334 @@
+from collections import OrderedDict
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QApplication, QMenu, QStyle
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QUrl, QEvent, QPointF
+from PyQt5.QtGui import (
+    QTextDocument,
+    QAbstractTextDocumentLayout,
+    QPalette,
+    QColor,
+    QPainter,
+    QDesktopServices,
+    QKeySequence
+)
+
+from __render import RenderWorker
+
+# CSS for Markdown in chat messages
+CHAT_STYLESHEET = """
+    body {
+        color: #ffffff;
+    }
+    code {
+        background-color: #363636;
+        padding: 2px 4px;
+        border-radius: 4px;
+        font-family: 'Consolas', monospace;
+    }
+    pre {
+        background-color: #363636;
+        padding: 10px;
+        border-radius: 8px;
+        margin: 10px 0;
+    }
+    blockquote {
+        border-left: 4px solid #5294e2;
+        margin: 10px 0;
+        padding-left: 10px;
+        color: #a0a0a0;
+    }
+    h1, h2, h3, h4, h5, h6 {
+        color: #73b2ff;
+        margin: 10px 0;
+    }
+    table {
+        border-collapse: collapse;
+        margin: 10px 0;
+    }
+    th, td {
+        border: 1px solid #404040;
+        padding: 6px;
+    }
+    th {
+        background-color: #363636;
+    }
+    a {
+        color: #73b2ff;
+    }
+"""
+
+class ChatModel(QAbstractListModel):
+    """Chat messages with their Markdown source and rendered HTML
+
+    The full history lives in a plain list, and the model only exposes a
+    window at its end: rows are message ids minus `first`. Keeping the window
+    bounded keeps Qt's per-insert relayout the same cost no matter how long
+    the session gets; older messages are loaded back when scrolled to.
+    Messages outside the window drop their HTML and are rendered again
+    from their source when they come back.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.history = []
+        self.first = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.history) - self.first
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self.history[self.first + index.row()]['text']
+        return None
+
+    def message(self, row):
+        return self.history[self.first + row]
+
+    def append_message(self, text):
+        message_id = len(self.history)
+        row = message_id - self.first
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.history.append({'id': message_id, 'text': text, 'html': "", 'version': 0, 'size': None})
+        self.endInsertRows()
+        return message_id
+
+    def set_text(self, message_id, text):
+        self.history[message_id]['text'] = text
+
+    def set_html(self, message_id, html):
+        # A render that finishes after its message left the window is not kept
+        if message_id < self.first:
+            return
+        message = self.history[message_id]
+        message['html'] = html
+        message['version'] += 1
+        if message_id >= self.first:
+            index = self.index(message_id - self.first)
+            self.dataChanged.emit(index, index)
+
+    def trim(self, keep):
+        """Drop all but the last `keep` rows from the window"""
+        count = self.rowCount() - keep
+        if count > 0:
+            self.beginRemoveRows(QModelIndex(), 0, count - 1)
+            # Only the Markdown source is kept for messages outside the window
+            for message in self.history[self.first:self.first + count]:
+                message['html'] = None
+                message['size'] = None
+            self.first += count
+            self.endRemoveRows()
+
+    def load_earlier(self, count):
+        """Bring up to `count` older messages back into the window; they need rendering again"""
+        count = min(count, self.first)
+        if count > 0:
+            self.beginInsertRows(QModelIndex(), 0, count - 1)
+            self.first -= count
+            self.endInsertRows()
+        return count
+
+
+class ChatDelegate(QStyledItemDelegate):
+    """Paints messages from cached QTextDocuments, keeping only the most recent ones
+
+    Sizes are remembered on each message per version and width, so laying out
+    the window never builds documents for messages that are off screen.
+    """
+
+    MARGIN = 8
+
+    def __init__(self, view, cache_size=64):
+        super().__init__(view)
+        self.view = view
+        self.documents = OrderedDict()
+        self.cache_size = cache_size
+
+    def _width(self):
+        return max(self.view.viewport().width() - 2 * self.MARGIN, 50)
+
+    def document(self, message):
+        key = (message['id'], message['version'], self._width())
+        document = self.documents.get(key)
+        if document is not None:
+            self.documents.move_to_end(key)
+            return document
+
+        document = QTextDocument()
+        document.setDefaultStyleSheet(CHAT_STYLESHEET)
+        document.setDocumentMargin(0)
+        # Plain text stands in until a message that was trimmed is rendered again
+        if message['html'] is None:
+            document.setPlainText(message['text'])
+        else:
+            document.setHtml(message['html'])
+        document.setTextWidth(key[2])
+
+        # Free the documents of messages that scrolled out of view long ago
+        self.documents[key] = document
+        if len(self.documents) > self.cache_size:
+            self.documents.popitem(last=False)
+        return document
+
+    def sizeHint(self, option, index):
+        message = index.model().message(index.row())
+        width = self._width()
+        size = message['size']
+        if size is None or size[:2] != (message['version'], width):
+            height = int(self.document(message).size().height()) + 2 * self.MARGIN
+            size = (message['version'], width, QSize(width, height))
+            message['size'] = size
+        return size[2]
+
+    def paint(self, painter, option, index):
+        document = self.document(index.model().message(index.row()))
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, QColor("#ffffff"))
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Mark the message that Ctrl+C copies
+        if option.state & QStyle.State_HasFocus:
+            painter.fillRect(option.rect, QColor(255, 255, 255, 14))
+        painter.translate(option.rect.left() + self.MARGIN, option.rect.top() + self.MARGIN)
+        painter.setClipRect(0, 0, option.rect.width(), option.rect.height())
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # Open links in the browser, like QTextBrowser.setOpenExternalLinks
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            position = QPointF(event.pos() - option.rect.topLeft()) - QPointF(self.MARGIN, self.MARGIN)
+            document = self.document(model.message(index.row()))
+            anchor = document.documentLayout().anchorAt(position)
+            if anchor:
+                QDesktopServices.openUrl(QUrl(anchor))
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ChatView(QListView):
+    """Chat history that only paints the messages on screen
+
+    Messages are added with append_markdown() and rewritten with
+    update_markdown() or the stream methods; Markdown is rendered on a
+    RenderWorker thread. Text cannot be selected inside a message; the
+    context menu and Ctrl+C copy a whole message's Markdown instead.
+    """
+
+    # Messages kept in the view, and how many more to load when scrolled to the top
+    WINDOW = 200
+    LOAD_BATCH = 50
+
+    def __init__(self, placeholder_text="", parent=None):
+        super().__init__(parent)
+        self.placeholder_text = placeholder_text
+        self.setStyleSheet("""
+            QListView {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                border: none;
+                border-radius: 8px;
+                padding: 8px;
+            }
+            QListView:focus {
+                border: 1px solid #5294e2;
+            }
+        """)
+
+        self.chat_model = ChatModel(self)
+        self.setModel(self.chat_model)
+        self.setItemDelegate(ChatDelegate(self))
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(False)
+        self.setMouseTracking(True)
+
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+
+        self.render_worker = None
+        self._stream_id = None
+        self._follow = True
+
+    def append_markdown(self, text):
+        """Add a message at the end and return its id"""
+        message_id = self.chat_model.append_message(text)
+        self.update_markdown(message_id, text)
+        return message_id
+
+    def update_markdown(self, message_id, text, trace_id=None):
+        if self.render_worker is None:
+            self.render_worker = RenderWorker(self)
+            self.render_worker.rendered.connect(self._set_html)
+            self.render_worker.start()
+        self.chat_model.set_text(message_id, text)
+        self.render_worker.request(message_id, text, trace_id)
+
+    def _set_html(self, message_id, html):
+        self.chat_model.set_html(message_id, html)
+        # Follow new output only if the user has not scrolled up
+        if self._follow:
+            self.chat_model.trim(self.WINDOW)
+            self.scrollToBottom()
+
+    def _on_scrolled(self, value):
+        scrollbar = self.verticalScrollBar()
+        self._follow = value >= scrollbar.maximum() - 4
+        if value != scrollbar.minimum() or self.chat_model.first == 0:
+            return
+
+        # Load older messages above the current ones without moving the view
+        scrollbar = self.verticalScrollBar()
+        previous_maximum = scrollbar.maximum()
+        count = self.chat_model.load_earlier(self.LOAD_BATCH)
+        if count:
+            for row in range(count):
+                message = self.chat_model.message(row)
+                self.update_markdown(message['id'], message['text'])
+            self.doItemsLayout()
+            scrollbar.setValue(scrollbar.maximum() - previous_maximum)
+
+    def copy_message(self, index):
+        """Put a message's Markdown source on the clipboard"""
+        if index.isValid():
+            QApplication.clipboard().setText(self.chat_model.message(index.row())['text'].strip())
+
+    def _show_context_menu(self, position):
+        index = self.indexAt(position)
+        if not index.isValid():
+            return
+        self.setCurrentIndex(index)
+        menu = QMenu(self)
+        menu.addAction("Copy message", lambda: self.copy_message(index))
+        menu.exec_(self.viewport().mapToGlobal(position))
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            self.copy_message(self.currentIndex())
+            return
+        super().keyPressEvent(event)
+
+    def begin_stream(self):
+        self._stream_id = self.append_markdown("")
+
+    def update_stream(self, text, trace_id=None):
+        if self._stream_id is None:
+            self.begin_stream()
+        self.update_markdown(self._stream_id, text, trace_id)
+
+    def end_stream(self):
+        self._stream_id = None
+
+    def stop_rendering(self):
+        if self.render_worker is not None:
+            self.render_worker.stop()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.chat_model.rowCount() == 0 and self.placeholder_text:
+            painter = QPainter(self.viewport())
+            painter.setPen(QColor("#808080"))
+            painter.drawText(self.viewport().rect().adjusted(8, 8, -8, -8),
+                             Qt.AlignLeft | Qt.AlignTop, self.placeholder_text)
@@ -0,0 +1,142 @@
+import numpy as np
+
+# Voice effects that run on a single float32 buffer in [-1, 1].
+# Every stage writes its result back into the buffer it was given, so a chain
+# converts to int16 only once, right before the audio leaves the chain.
+# scipy.signal takes most of a second to import, so it is loaded on first use
+# (the app preloads it in the background after start-up).
+
+
+def pitch_wobble(samples: np.ndarray, sample_rate: int,
+                 depth: float = 0.1, rate: float = 10 / (2 * np.pi)) -> np.ndarray:
+    """Apply a time-varying pitch shift of depth * sin(2*pi*rate*t) octaves in one pass
+
+    The signal is read back through a smoothly modulated delay line: playing it
+    faster raises the pitch and slower lowers it, and the read position never
+    drifts more than a few milliseconds from real time. There are no chunk
+    boundaries, so there is nothing to click.
+    """
+    n = len(samples)
+    if n < 2:
+        return samples.astype(np.float32)
+
+    t = np.arange(n) / sample_rate
+    ratio = np.exp2(depth * np.sin(2 * np.pi * rate * t))
+
+    # Integrate the playback rate into a read position that still spans the whole clip
+    position = np.empty(n)
+    position[0] = 0.0
+    np.cumsum(ratio[:-1], out=position[1:])
+    position *= (n - 1) / position[-1]
+
+    return np.interp(position, np.arange(n), samples).astype(np.float32)
+
+
+class Effect:
+    """One stage of an EffectChain"""
+
+    def process(self, buffer: np.ndarray, sample_rate: int):
+        """Modify buffer in place"""
+        raise NotImplementedError
+
+    def params(self) -> dict:
+        """Parameters that define the sound of this effect"""
+        return dict(vars(self))
+
+    def __repr__(self):
+        args = ", ".join(f"{name}={value!r}" for name, value in self.params().items())
+        return f"{type(self).__name__}({args})"
+
+
+class PitchWobble(Effect):
+    """Sinusoidal pitch wobble of +/- depth octaves at rate Hz"""
+
+    def __init__(self, depth=0.1, rate=10 / (2 * np.pi)):
+        self.depth = depth
+        self.rate = rate
+
+    def process(self, buffer, sample_rate):
+        buffer[:] = pitch_wobble(buffer, sample_rate, self.depth, self.rate)
+
+
+class Reverb(Effect):
+    """Echoes every delay_ms, each one decay dB quieter than the last, via FFT convolution"""
+
+    def __init__(self, delay_ms=20, decay=0.05, echoes=2):
+        self.delay_ms = delay_ms
+        self.decay = decay
+        self.echoes = echoes
+
+    def impulse_response(self, sample_rate):
+        delay = int(sample_rate * self.delay_ms / 1000)
+        response = np.zeros(delay * self.echoes + 1, dtype=np.float32)
+        response[0] = 1.0
+        for i in range(1, self.echoes + 1):
+            response[i * delay] = 10 ** (-self.decay * i / 20)
+        return response
+
+    def process(self, buffer, sample_rate):
+        from scipy.signal import oaconvolve
+        # Echoes past the end of the clip are dropped, so the length is unchanged
+        buffer[:] = oaconvolve(buffer, self.impulse_response(sample_rate))[:len(buffer)]
+
+
+class HighPass(Effect):
+    """First-order RC high-pass filter, run as a vectorized IIR"""
+
+    def __init__(self, cutoff=1000):
+        self.cutoff = cutoff
+
+    def process(self, buffer, sample_rate):
+        from scipy.signal import lfilter
+        rc = 1 / (2 * np.pi * self.cutoff)
+        alpha = rc / (rc + 1 / sample_rate)
+        buffer[:] = lfilter([alpha, -alpha], [1, -alpha], buffer)
+
+
+class Gain(Effect):
+    """Scale the signal by db decibels"""
+
+    def __init__(self, db=0.0):
+        self.db = db
+
+    def process(self, buffer, sample_rate):
+        buffer *= np.float32(10 ** (self.db / 20))
+
+
+class EffectChain:
+    """Runs a list of effects over one float32 buffer"""
+
+    def __init__(self, effects=None):
+        self.effects = list(effects or [])
+
+    def process(self, buffer: np.ndarray, sample_rate: int) -> np.ndarray:
+        for effect in self.effects:
+            effect.process(buffer, sample_rate)
+        return buffer
+
+    def params(self) -> list:
+        return [(type(effect).__name__, effect.params()) for effect in self.effects]
+
+    def __repr__(self):
+        return f"EffectChain({self.effects!r})"
+
+
+def default_voice_effects() -> EffectChain:
+    """The assistant's voice: pitch wobble, a short reverb and a 1 kHz high-pass"""
+    return EffectChain([
+        PitchWobble(depth=0.1),
+        Reverb(delay_ms=20, decay=0.05),
+        HighPass(cutoff=1000),
+    ])
+
+
+def to_float32(pcm: np.ndarray) -> np.ndarray:
+    """int16 samples to a float32 buffer in [-1, 1]"""
+    return pcm.astype(np.float32) / 32768
+
+
+def to_int16(buffer: np.ndarray) -> np.ndarray:
+    """float32 buffer back to int16, clipping anything out of range"""
+    np.clip(buffer, -1.0, 32767 / 32768, out=buffer)
+    return (buffer * 32768).astype(np.int16)
@@ -1,6 +1,7 @@
 from PyQt5.QtWidgets import (
     QLineEdit, 
     QTextEdit,
+    QPlainTextEdit,
     QPushButton
 )
 
@@ -34,6 +35,22 @@ class StyledTextEdit(QTextEdit):
             }
         """)
 
+class StyledLogView(QPlainTextEdit):
+    def __init__(self, placeholder_text="", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setPlaceholderText(placeholder_text)
+        self.setReadOnly(True)
+        self.setStyleSheet("""
+            QPlainTextEdit {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                border: none;
+                border-radius: 8px;
+                padding: 8px;
+                selection-background-color: #3d3d3d;
+            }
+        """)
+
 class StyledLineEdit(QLineEdit):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,43 @@
+import numpy as np
+
+# Mouth movement for the avatar, worked out once per sentence from the final PCM.
+# Each frame holds two bytes: how far the mouth is open (from the frame level)
+# and how wide rather than round it is (from the spectral centroid, high for
+# "ee" and "s", low for "oo"). The viewer plays the track back against the clock.
+
+FRAME_MS = 20
+
+# Levels this far below the loud parts of the sentence count as a closed mouth
+RANGE_DB = 30.0
+
+# Spectral centroid range mapped from round (0) to wide (1)
+ROUND_HZ = 500.0
+WIDE_HZ = 3000.0
+
+
+def viseme_track(pcm: bytes, sample_rate: int, frame_ms: int = FRAME_MS) -> bytes:
+    """uint8 [open, wide] pairs, one per frame_ms of int16 mono PCM"""
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+    frame = max(sample_rate * frame_ms // 1000, 1)
+    count = -(-len(samples) // frame)
+    if count == 0:
+        return b''
+
+    # Pad the last frame with silence and look at all frames at once
+    frames = np.zeros(count * frame, dtype=np.float32)
+    frames[:len(samples)] = samples
+    frames = frames.reshape(count, frame)
+
+    level = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    peak = np.percentile(level, 95)
+    mouth_open = np.clip((level - (peak - RANGE_DB)) / RANGE_DB, 0, 1)
+    # Light smoothing so the jaw does not flutter from frame to frame
+    mouth_open = np.convolve(mouth_open, [0.25, 0.5, 0.25], mode='same')
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1)) ** 2
+    frequencies = np.fft.rfftfreq(frame, 1 / sample_rate)
+    centroid = power @ frequencies / (power.sum(axis=1) + 1e-12)
+    wide = np.clip((centroid - ROUND_HZ) / (WIDE_HZ - ROUND_HZ), 0, 1)
+
+    track = np.stack([mouth_open, wide], axis=1)
+    return np.round(track * 255).astype(np.uint8).tobytes()
@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+DEFAULT_MODEL = 'qwen2.5'
+DEFAULT_KEEP_ALIVE = '30m'
+# Seconds to wait for the server when unloading the model on exit
+RELEASE_TIMEOUT = 2.0
+
+
+class LLMClient:
+    """Ollama client shared by every request in the session
+
+    One ollama.Client means one pooled HTTP connection to the server instead of
+    the module-level default. Model, keep-alive and options are fixed per
+    session: changing options such as num_ctx between calls makes the server
+    reload the model and throws away its prompt cache.
+
+    The ollama package (and httpx under it) is imported when the client is
+    first used, which is on the warm-up thread rather than during start-up.
+
+    The model is left loaded on exit so the next start, and anyone else using
+    the same server, finds it warm; set AI_ASSISTANT_UNLOAD_ON_EXIT=1 to have
+    release() free it instead.
+    """
+
+    def __init__(self, host=None, model=None, keep_alive=None, options=None, unload_on_exit=None):
+        self.host = host or os.environ.get('OLLAMA_HOST')
+        self.model = model or os.environ.get('AI_ASSISTANT_MODEL', DEFAULT_MODEL)
+        self.keep_alive = keep_alive or os.environ.get('AI_ASSISTANT_KEEP_ALIVE', DEFAULT_KEEP_ALIVE)
+        if unload_on_exit is None:
+            unload_on_exit = os.environ.get('AI_ASSISTANT_UNLOAD_ON_EXIT', '') == '1'
+        self.unload_on_exit = unload_on_exit
+        self.options = options or {}
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import ollama
+                self._client = ollama.Client(host=self.host)
+            return self._client
+
+    def chat(self, messages, stream=False):
+        return self.client.chat(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            keep_alive=self.keep_alive,
+            options=self.options or None
+        )
+
+    def warm_up(self, system_prompt=None):
+        """Load the model and prefill the system prompt so the first question skips both"""
+        messages = []
+        if system_prompt:
+            messages = [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': 'Hi'}
+            ]
+        # Only the prompt matters here; generate a single token and drop it
+        self.client.chat(
+            model=self.model,
+            messages=messages,
+            keep_alive=self.keep_alive,
+            options={**self.options, 'num_predict': 1}
+        )
+
+    def release(self, timeout=RELEASE_TIMEOUT):
+        """Ask the server to unload the model right away, if unload_on_exit is set
+
+        Runs on the GUI thread while the window closes, so it uses its own
+        client with a short timeout instead of the shared one.
+        """
+        # Nothing was loaded through a client that never connected
+        if not self.unload_on_exit or self._client is None:
+            return
+        import ollama
+        ollama.Client(host=self.host, timeout=timeout).chat(model=self.model, messages=[], keep_alive=0)
+
+
+class WarmupWorker(QThread):
+    """Warms up the model in the background while the avatar loads"""
+    finished = pyqtSignal(float)
+    error = pyqtSignal(str)
+
+    def __init__(self, client: LLMClient, system_prompt=None):
+        super().__init__()
+        self.client = client
+        self.system_prompt = system_prompt
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.client.warm_up(self.system_prompt)
+            self.finished.emit(time.perf_counter() - start)
+        except Exception as e:
+            self.error.emit(str(e))
@@ -1,5 +1,11 @@
+import os
 import sys
-import ollama
+import time
+import threading
+
+# Origin of the startup report, taken before the imports below
+STARTUP_ORIGIN = time.perf_counter()
+
 from PyQt5.QtWidgets import (
     QApplication, 
     QMainWindow,  
@@ -7,154 +13,170 @@ from PyQt5.QtWidgets import (
     QHBoxLayout, 
     QWidget, 
     QFrame,
-    QTextBrowser
+    QShortcut
 )
 
-import markdown
-from markdown.extensions import fenced_code, tables
-
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtCore import QUrl, Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QKeySequence
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module="TTS.utils.io")
 
-# Module Import
-from __voice import *
+# Module Import; the heavy audio and LLM libraries are loaded on first use
+from __voice import SentenceSplitter, TTSService, VoiceHandler, PcmPlayer, VoiceWorker
+from __tts_cache import TTSCache
 from __avatar import *
 from __gui_style import *
+from __memory import ConversationMemory, SummaryWorker
+from __llm import LLMClient, WarmupWorker
+from __chat_view import ChatView
+from __status_log import StatusLog
+from __speech_input import SpeechListener, EnergyVAD
+from __startup import StartupProfile, PreloadWorker
+from __trace import TRACER
+from __watchdog import StallWatchdog
+from __scheduler import Turn, TurnScheduler
 
-# System Prompt
+# System Prompt; keep it constant so the server's prompt cache can reuse it every turn
 SYSTEM_PROMPT = """
 You are Alt, an assistant AI designed to help users with their queries.
 """
 
-# Ollama Worker Class (unchanged)
+# Stream partial tokens into the chat log while the reply is generated
+STREAM_RESPONSES = True
+
+# Minimum delay between re-renders of a streamed message (ms)
+STREAM_RENDER_INTERVAL = 50
+
+# A question asked while a reply is running either pre-empts it ('preempt') or waits for it ('queue')
+TURN_POLICY = 'preempt'
+
+# Fenced code in a reply is either skipped or announced in one sentence when spoken
+SPOKEN_CODE_POLICY = 'summarize'
+
+# GUI thread blocked for longer than this is reported with the slot that was running (ms)
+STALL_THRESHOLD_MS = 100
+
+# Ollama Worker Class
 class OllamaWorker(QThread):
+    token = pyqtSignal(str)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
     
-    def __init__(self, prompt, context=""):
+    def __init__(self, client, messages, stream=STREAM_RESPONSES, trace_id=None):
         super().__init__()
-        self.prompt = prompt
-        self.context = context
+        self.client = client
+        self.messages = messages
+        self.stream = stream
+        self.trace_id = trace_id
+        self.cancelled = threading.Event()
+        
+    def cancel(self):
+        """Stop at the next chunk; closing the stream makes the server stop generating"""
+        self.cancelled.set()
         
     def run(self):
         try:
-            response = ollama.chat(
-                model='qwen2.5',
-                messages=[
-                    {
-                        'role': 'system',
-                        'content': SYSTEM_PROMPT
-                    },
-                    {
-                        'role': 'user',
-                        'content': self.context + "\n" + self.prompt
-                    }
-                ]
-            )
-            self.finished.emit(response['message']['content'])
+            if not self.stream:
+                with TRACER.span('llm.generate', self.trace_id):
+                    response = self.client.chat(self.messages)
+                if not self.cancelled.is_set():
+                    self.finished.emit(response['message']['content'])
+                return
+            
+            # Emit every partial chunk as soon as the server produces it
+            parts = []
+            start = first = time.perf_counter_ns()
+            stream = self.client.chat(self.messages, stream=True)
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    stream.close()
+                    TRACER.record('llm.generate', first, time.perf_counter_ns(), self.trace_id,
+                                  chunks=len(parts), cancelled=True)
+                    return
+                content = chunk['message']['content']
+                if content:
+                    if not parts:
+                        first = time.perf_counter_ns()
+                        TRACER.record('llm.prefill', start, first, self.trace_id)
+                    parts.append(content)
+                    self.token.emit(content)
+            TRACER.record('llm.generate', first, time.perf_counter_ns(), self.trace_id, chunks=len(parts))
+            self.finished.emit(''.join(parts))
         except Exception as e:
-            self.error.emit(str(e))
-
-# MD file format for the text box.
-class MarkdownTextBrowser(QTextBrowser):
-    def __init__(self, placeholder_text="", parent=None):
-        super().__init__(parent)
-        self.setPlaceholderText(placeholder_text)
-        self.setOpenExternalLinks(True)
-        self.setStyleSheet("""
-            QTextBrowser {
-                background-color: #2b2b2b;
-                color: #ffffff;
-                border: none;
-                border-radius: 8px;
-                padding: 8px;
-                selection-background-color: #3d3d3d;
-            }
-            QTextBrowser:focus {
-                border: 1px solid #5294e2;
-            }
-        """)
-        
-        # Add CSS for Markdown styling
-        self.document().setDefaultStyleSheet("""
-            code {
-                background-color: #363636;
-                padding: 2px 4px;
-                border-radius: 4px;
-                font-family: 'Consolas', monospace;
-            }
-            pre {
-                background-color: #363636;
-                padding: 10px;
-                border-radius: 8px;
-                margin: 10px 0;
-            }
-            blockquote {
-                border-left: 4px solid #5294e2;
-                margin: 10px 0;
-                padding-left: 10px;
-                color: #a0a0a0;
-            }
-            h1, h2, h3, h4, h5, h6 {
-                color: #73b2ff;
-                margin: 10px 0;
-            }
-            table {
-                border-collapse: collapse;
-                margin: 10px 0;
-            }
-            th, td {
-                border: 1px solid #404040;
-                padding: 6px;
-            }
-            th {
-                background-color: #363636;
-            }
-        """)
-
-    def append_markdown(self, text):
-        # Configure Markdown with extensions
-        md = markdown.Markdown(extensions=[
-            'fenced_code',
-            'tables',
-            'nl2br',  # Convert newlines to <br>
-            'codehilite',  # Syntax highlighting
-            'sane_lists'  # Better list handling
-        ])
-        
-        # Convert Markdown to HTML
-        html = md.convert(text)
-        
-        # Append the HTML to the browser
-        self.append(html)
-        
-        # Scroll to bottom
-        scrollbar = self.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+            if not self.cancelled.is_set():
+                self.error.emit(str(e))
 
 # Main Application Class
 class AIAssistantApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup: StartupProfile = None):
         super().__init__()
+        self.startup = startup or StartupProfile()
+        self.startup.expect('viewer page', 'viewer', 'avatar', 'audio stack', 'language model')
         self.setWindowTitle("AI Assistant")
         self.setGeometry(100, 100, 1600, 900)
         self.setup_ui()
+        self.mark_startup('window setup')
         
-        # Initialize avatar model after a short delay
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(1000, self.load_initial_model)
+        # Runs once the event loop is up, right after the window is first shown
+        QTimer.singleShot(0, self.start_background_services)
     
-    def load_initial_model(self):
+    def mark_startup(self, phase):
+        if self.startup.mark(phase) and not self.startup.reported:
+            self.log_status(self.startup.report())
+    
+    def start_background_services(self):
+        self.mark_startup('window shown')
+        
+        # Load the language model while the avatar is loading
+        self.warmup_worker = WarmupWorker(self.llm, SYSTEM_PROMPT)
+        self.warmup_worker.finished.connect(self.handle_warmup_finished)
+        self.warmup_worker.error.connect(self.handle_warmup_error)
+        self.warmup_worker.start()
+        
+        # One TTS process for the whole session; replies only pay for synthesis
+        self.tts_service.start()
+        
+        # The TTS cache measures its size on disk here rather than in the constructor
+        tasks = [self.tts_cache.measure] if self.tts_cache is not None else []
+        self.preload_worker = PreloadWorker(tasks=tasks)
+        self.preload_worker.finished.connect(lambda seconds: self.mark_startup('audio stack'))
+        self.preload_worker.start()
+        
+        self.watchdog.start()
+    
+    def handle_warmup_finished(self, seconds):
+        self.log_status(f"Language model {self.llm.model} ready ({seconds:.1f}s)")
+        self.mark_startup('language model')
+    
+    def handle_warmup_error(self, error):
+        self.log_status(f"Error warming up language model: {error}")
+        self.mark_startup('language model')
+    
+    def load_initial_model(self, ok):
+        # Called from the viewer's loadFinished, so the page is ready for loadModel()
+        self.mark_startup('viewer page')
+        if not ok:
+            self.log_status("Error: the avatar viewer failed to load")
+            self.mark_startup('avatar')
+            return
+        
         # Replace with your actual model path
         model_path = "models/kara.glb"
         model_background = "background.jpeg"
-        self.avatar_widget.set_avatar_model(model_path)
+        if not self.avatar_widget.set_avatar_model(model_path):
+            self.mark_startup('avatar')
         self.avatar_widget.set_background_image(model_background)
         self.log_status("Loading initial 3D model...")
     
+    def handle_stall(self, ms, blame):
+        self.log_status(f"GUI stalled for {ms:.0f} ms in {blame}")
+        
+    def handle_viewer_message(self, message):
+        if message.startswith("Viewer initialized"):
+            self.mark_startup('viewer')
+        elif message.startswith(("Model loaded", "Error loading model")):
+            self.mark_startup('avatar')
+    
     def setup_ui(self):
         # Set up the main window styling
         self.setStyleSheet("""
@@ -167,8 +189,19 @@ class AIAssistantApp(QMainWindow):
             }
         """)
         
-        # Initialize media player
-        self.media_player = QMediaPlayer()
+        # Initialize the in-memory player for synthesized sentences
+        self.audio_player = PcmPlayer(self)
+        self.audio_player.idle.connect(self.handle_playback_idle)
+        
+        # Owns every running turn and its workers; Escape stops the current one
+        self.scheduler = TurnScheduler(self.audio_player, TURN_POLICY, self)
+        self.scheduler.started.connect(self.start_turn)
+        self.scheduler.cancelled.connect(self.handle_turn_cancelled)
+        self.stop_shortcut = QShortcut(QKeySequence(Qt.Key_Escape), self)
+        self.stop_shortcut.activated.connect(self.scheduler.cancel)
+        
+        # Turns whose reply is done and that wait for their audio to finish
+        self.finishing = []
         
         # Create central widget and main layout
         self.central_widget = QWidget()
@@ -185,12 +218,38 @@ class AIAssistantApp(QMainWindow):
         
         self.central_widget.setLayout(self.main_layout)
         
-        # Initialize workers
-        self.voice_worker = None
-        self.ollama_worker = None
+        # Initialize workers; the reply workers belong to the scheduler
+        self.warmup_worker = None
+        self.preload_worker = None
         
-        # Initialize conversation context
-        self.conversation_context = ""
+        # One Ollama client for the session
+        self.llm = LLMClient()
+        
+        # The TTS process itself is started once the window is up
+        self.tts_service = TTSService()
+        try:
+            self.tts_cache = TTSCache()
+        except OSError as e:
+            # An unwritable cache directory only costs the cache, not the voice
+            self.tts_cache = None
+            self.log_status(f"TTS cache disabled: {e}")
+        self.voice_handler = VoiceHandler(self.tts_service, cache=self.tts_cache,
+                                          code_policy=SPOKEN_CODE_POLICY)
+        
+        # Initialize conversation memory; older turns are summarized in the background
+        self.memory = ConversationMemory()
+        self.summary_worker = None
+        
+        # Text of the reply that is currently streaming in
+        self.stream_text = ""
+        self.stream_trace_id = None
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setSingleShot(True)
+        self.stream_timer.timeout.connect(self.render_stream)
+        
+        # Watches the event loop once the window is up
+        self.watchdog = StallWatchdog(STALL_THRESHOLD_MS, parent=self)
+        self.watchdog.stalled.connect(self.handle_stall)
         
         # Set application font
         app_font = QFont("Segoe UI", 10)
@@ -210,7 +269,12 @@ class AIAssistantApp(QMainWindow):
         
         # Create and add avatar widget
         self.avatar_widget = AvatarWidget()
+        self.avatar_widget.viewer_loaded.connect(self.load_initial_model)
+        self.avatar_widget.model_controller.message.connect(self.handle_viewer_message)
         self.left_layout.addWidget(self.avatar_widget)
+        # The avatar mouths each sentence as the player starts it
+        self.audio_player.clip_started.connect(self.avatar_widget.play_lip_sync)
+        self.audio_player.stopped.connect(self.avatar_widget.stop_lip_sync)
         self.left_panel.setLayout(self.left_layout)
         self.main_layout.addWidget(self.left_panel, stretch=1)
 
@@ -233,19 +297,18 @@ class AIAssistantApp(QMainWindow):
         self.main_layout.addWidget(self.right_panel, stretch=2)
 
     def setup_chat_components(self):
-        # MarkdownTextBrowser
-        self.chat_log = MarkdownTextBrowser(placeholder_text="Chat logs will appear here...")
-        self.chat_log.setReadOnly(True)
+        # Virtualized chat history; only visible messages are painted
+        self.chat_log = ChatView(placeholder_text="Chat logs will appear here...")
         self.right_layout.addWidget(self.chat_log, stretch=2)
         
         # Input area
         self.setup_input_area()
         
-        # Status log can remain as is or also be converted to Markdown
-        self.status_log = MarkdownTextBrowser(placeholder_text="Status updates will appear here...")
-        self.status_log.setReadOnly(True)
+        # Status log; writes are buffered and flushed to the widget ten times a second
+        self.status_log = StyledLogView(placeholder_text="Status updates will appear here...")
         self.status_log.setMaximumHeight(150)
         self.right_layout.addWidget(self.status_log)
+        self.status_sink = StatusLog(self.status_log, log_file=os.environ.get('AI_ASSISTANT_STATUS_LOG'))
 
     def setup_input_area(self):
         self.input_frame = QFrame()
@@ -268,25 +331,28 @@ class AIAssistantApp(QMainWindow):
         self.submit_button.clicked.connect(self.process_text_input)
         self.submit_button.setFixedWidth(100)
         
+        self.mic_button = StyledButton("🎤")
+        self.mic_button.setCheckable(True)
+        self.mic_button.setToolTip("Ask by voice")
+        self.mic_button.clicked.connect(self.toggle_voice_input)
+        self.mic_button.setFixedWidth(48)
+        
+        # Offline recognizer, loaded by the first listener and reused afterwards
+        self.speech_listener = None
+        self.speech_backend = None
+        # One detector for every session, so its noise estimate carries over
+        self.speech_vad = EnergyVAD()
+        
         self.input_layout.addWidget(self.input_bar)
+        self.input_layout.addWidget(self.mic_button)
         self.input_layout.addWidget(self.submit_button)
         self.input_frame.setLayout(self.input_layout)
         self.right_layout.addWidget(self.input_frame)
 
     # Keep all other methods from your original implementation
     def log_status(self, message):
-        current_text = self.status_log.toPlainText()
-        if len(current_text.split('\n')) > 100:
-            lines = current_text.split('\n')[50:]
-            self.status_log.setPlainText('\n'.join(lines))
-        
-        self.status_log.append(f"[{self.get_timestamp()}] {message}")
-        scrollbar = self.status_log.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-        
-    def get_timestamp(self):
-        from datetime import datetime
-        return datetime.now().strftime("%H:%M:%S")
+        # Safe from any thread; shown on the next flush
+        self.status_sink.write(message)
 
     def append_chat_log(self, user_input, response):
         # Format messages with Markdown
@@ -298,64 +364,274 @@ class AIAssistantApp(QMainWindow):
         self.chat_log.append_markdown(ai_message)
         self.chat_log.append_markdown("---\n")  # Add separator between messages
         
+    def begin_streamed_chat_log(self, user_input, trace_id=None):
+        # Show the question right away and reserve a block for the reply
+        self.chat_log.append_markdown(f"### 👤 Me:\n{user_input}\n")
+        self.chat_log.begin_stream()
+        self.stream_text = ""
+        self.stream_trace_id = trace_id
+        self.render_stream()
+        
+    def handle_ollama_token(self, token, turn):
+        if turn.cancelled:
+            return
+        self.stream_text += token
+        # Hand every finished sentence to the voice pipeline right away
+        for sentence in turn.splitter.feed(token):
+            turn.voice_worker.speak(sentence)
+        # Coalesce bursts of tokens into a single re-render
+        if not self.stream_timer.isActive():
+            self.stream_timer.start(STREAM_RENDER_INTERVAL)
+            
+    def render_stream(self):
+        self.chat_log.update_stream(f"### 🤖 AI:\n{self.stream_text}\n", self.stream_trace_id)
+        
+    def finish_streamed_chat_log(self, response):
+        self.stream_timer.stop()
+        self.stream_text = response
+        self.render_stream()
+        self.chat_log.end_stream()
+        self.chat_log.append_markdown("---\n")  # Add separator between messages
+        
     def process_text_input(self):
         text = self.input_bar.text().strip()
         if text:
-            self.submit_button.setEnabled(False)
             self.input_bar.clear()
-            self.log_status("Generating response...")
-            
-            self.ollama_worker = OllamaWorker(text, self.conversation_context)
-            self.ollama_worker.finished.connect(lambda response: self.handle_ollama_response(text, response))
-            self.ollama_worker.error.connect(self.handle_ollama_error)
-            self.ollama_worker.start()
+            # Asking while a reply is running pre-empts it, or queues behind it (TURN_POLICY)
+            if not self.scheduler.submit(Turn(text, TRACER.new_trace())):
+                self.log_status(f"Queued: {text}")
         else:
             self.log_status("Error: Text input is empty. Please type something.")
             
-    def handle_ollama_response(self, user_input, response):
-        # Update conversation context
-        self.conversation_context += f"\nUser: {user_input}\nAssistant: {response}"
-        # Keep only last few exchanges to prevent context from growing too large
-        self.conversation_context = "\n".join(self.conversation_context.split("\n")[-10:])
-        
-        self.append_chat_log(user_input, response)
-        self.respond(response)
-        self.submit_button.setEnabled(True)
-        
-    def handle_ollama_error(self, error_message):
+    def start_turn(self, turn):
+        self.log_status("Generating response...")
+        
+        messages = self.memory.build_messages(SYSTEM_PROMPT, turn.text)
+        worker = OllamaWorker(self.llm, messages, trace_id=turn.trace_id)
+        turn.ollama_worker = worker
+        # Cleared by the worker's own signals, before the handlers below run
+        turn.generating = True
+        worker.finished.connect(turn.generation_done)
+        worker.error.connect(turn.generation_done)
+        if worker.stream:
+            self.begin_streamed_chat_log(turn.text, turn.trace_id)
+            self.start_voice_pipeline(turn)
+            worker.token.connect(lambda token: self.handle_ollama_token(token, turn))
+        worker.finished.connect(lambda response: self.handle_ollama_response(turn.text, response, turn))
+        worker.error.connect(lambda message: self.handle_ollama_error(message, turn))
+        self.scheduler.start_worker(turn, worker)
+        
+    def handle_turn_cancelled(self, turn):
+        # Close off a reply that was still streaming and keep what was said of it
+        if turn.reply is None and turn.ollama_worker.stream:
+            partial = self.stream_text
+            self.finish_streamed_chat_log(f"{partial}\n\n*(interrupted)*")
+            if partial:
+                self.memory.add_turn(turn.text, partial)
+                # A pre-empting turn starts right after this returns, in the same call
+                # stack; summarize only if none did, or it would compete with that reply
+                QTimer.singleShot(0, self.summarize_if_idle)
+        if turn in self.finishing:
+            self.finishing.remove(turn)
+        self.log_status("Stopped the current reply.")
+        if turn.trace_id is not None:
+            TRACER.record('turn', turn.started, time.perf_counter_ns(), turn.trace_id, cancelled=True)
+            self.log_status(TRACER.format_summary(turn.trace_id) + " (cancelled)")
+            
+    def toggle_voice_input(self):
+        if self.speech_listener is not None and self.speech_listener.isRunning():
+            self.speech_listener.stop()
+            return
+        
+        self.log_status("Listening...")
+        self.speech_listener = SpeechListener(self.speech_backend, self.speech_vad)
+        self.speech_listener.partial.connect(self.input_bar.setText)
+        self.speech_listener.final.connect(self.handle_voice_input)
+        self.speech_listener.error.connect(self.handle_voice_input_error)
+        self.speech_listener.finished.connect(lambda: self.mic_button.setChecked(False))
+        self.speech_listener.start()
+        
+    def handle_voice_input(self, text):
+        self.speech_backend = self.speech_listener.backend
+        if not text:
+            self.log_status("No speech recognized.")
+            return
+        # Start generating as soon as the speaker has stopped
+        self.input_bar.setText(text)
+        self.process_text_input()
+        
+    def handle_voice_input_error(self, error_message):
+        self.speech_backend = self.speech_listener.backend
+        self.log_status(f"Error: Voice input failed - {error_message}")
+        
+    def handle_ollama_response(self, user_input, response, turn):
+        if turn.cancelled:
+            return
+        turn.reply = response
+        
+        # Update conversation memory
+        self.memory.add_turn(user_input, response)
+        self.summarize_memory()
+        
+        if turn.ollama_worker.stream:
+            self.finish_streamed_chat_log(response)
+            self.finish_voice_pipeline(turn)
+        else:
+            self.append_chat_log(user_input, response)
+            self.respond(response, turn)
+        
+    def summarize_if_idle(self):
+        # Otherwise the summary runs after the next reply, like after any other turn
+        if self.scheduler.active is None and not self.scheduler.pending:
+            self.summarize_memory()
+        
+    def summarize_memory(self):
+        # One summary job at a time, and only while no reply is being generated
+        if self.summary_worker is not None and self.summary_worker.isRunning():
+            return
+        if not self.memory.has_pending():
+            return
+        
+        summary, pending = self.memory.pending_snapshot()
+        self.summary_worker = SummaryWorker(self.llm, SYSTEM_PROMPT, summary, pending)
+        self.summary_worker.finished.connect(self.handle_summary_ready)
+        self.summary_worker.error.connect(self.handle_summary_error)
+        self.summary_worker.start()
+        
+    def handle_summary_ready(self, summary, folded):
+        self.memory.apply_summary(summary, folded)
+        self.log_status(f"Summarized {folded // 2} earlier exchanges into conversation memory.")
+        if not self.scheduler.generating():
+            self.summarize_memory()
+        
+    def handle_summary_error(self, error_message):
+        self.log_status(f"Error summarizing conversation: {error_message}")
+        
+    def handle_ollama_error(self, error_message, turn):
+        if turn.cancelled:
+            return
+        if turn.ollama_worker.stream:
+            turn.reply = self.stream_text
+            self.finish_streamed_chat_log(self.stream_text)
+            self.finish_voice_pipeline(turn)
+        else:
+            self.scheduler.finish(turn)
         self.log_status(f"Error generating response: {error_message}")
-        self.submit_button.setEnabled(True)
             
-    def respond(self, response):
+    def respond(self, response, turn):
         self.log_status("Starting voice generation...")
         
-        self.voice_worker = VoiceWorker(response)
-        self.voice_worker.finished.connect(self.handle_voice_ready)
-        self.voice_worker.error.connect(self.handle_voice_error)
-        self.voice_worker.progress.connect(self.handle_progress)
-        self.voice_worker.start()
+        turn.voice_worker = VoiceWorker(self.voice_handler, response, trace_id=turn.trace_id)
+        self.connect_voice_worker(turn)
+        self.scheduler.start_worker(turn, turn.voice_worker)
+        
+    def start_voice_pipeline(self, turn):
+        # Sentences are fed in from handle_ollama_token while the reply streams
+        self.log_status("Starting voice generation...")
+        turn.splitter = SentenceSplitter()
+        
+        turn.voice_worker = VoiceWorker(self.voice_handler, trace_id=turn.trace_id)
+        self.connect_voice_worker(turn)
+        self.scheduler.start_worker(turn, turn.voice_worker)
+        
+    def finish_voice_pipeline(self, turn):
+        for sentence in turn.splitter.flush():
+            turn.voice_worker.speak(sentence)
+        turn.voice_worker.finish()
+        
+    def connect_voice_worker(self, turn):
+        # Everything a worker reports carries its turn, so a cancelled turn stays silent
+        worker = turn.voice_worker
+        worker.segment_ready.connect(
+            lambda pcm, sample_rate, track: self.handle_voice_ready(pcm, sample_rate, track, turn))
+        worker.finished.connect(lambda: self.handle_voice_finished(turn))
+        worker.error.connect(lambda message: self.handle_voice_error(message, turn))
+        worker.progress.connect(self.handle_progress)
         
     def handle_progress(self, value):
         self.log_status(f"Voice generation progress: {value}%")
         
-    def handle_voice_ready(self, audio_path):
-        self.log_status("Voice generation complete. Playing audio...")
-        url = QUrl.fromLocalFile(audio_path)
-        content = QMediaContent(url)
-        self.media_player.setMedia(content)
-        self.media_player.play()
-        
-    def handle_voice_error(self, error_message):
+    def handle_voice_ready(self, pcm, sample_rate, track, turn):
+        if turn.cancelled:
+            return
+        if not self.audio_player.is_playing():
+            self.log_status("Playing audio...")
+        self.audio_player.enqueue(pcm, sample_rate, track, turn.trace_id)
+            
+    def handle_voice_finished(self, turn):
+        if turn.cancelled:
+            return
+        if self.tts_cache is None:
+            self.log_status("Voice generation complete.")
+        else:
+            stats = self.tts_cache.stats()
+            self.log_status(
+                f"Voice generation complete. TTS cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%}), {stats['bytes'] / 1e6:.1f} MB"
+            )
+        self.finish_after_playback(turn)
+        
+    def finish_after_playback(self, turn):
+        # The turn is over once its last clip has been played
+        self.finishing.append(turn)
+        if not self.audio_player.is_playing():
+            self.handle_playback_idle()
+        
+    def handle_playback_idle(self):
+        while self.finishing:
+            turn = self.finishing.pop(0)
+            if turn.trace_id is not None:
+                TRACER.record('turn', turn.started, time.perf_counter_ns(), turn.trace_id)
+                self.log_status(TRACER.format_summary(turn.trace_id))
+            self.scheduler.finish(turn)
+        
+    def handle_voice_error(self, error_message, turn):
+        if turn.cancelled:
+            return
         self.log_status(f"Error: Voice processing failed - {error_message}")
+        self.finish_after_playback(turn)
+        
+    def closeEvent(self, event):
+        self.scheduler.shutdown()
+        self.audio_player.stop()
+        self.chat_log.stop_rendering()
+        self.watchdog.stop()
+        self.log_status(self.watchdog.report())
+        if TRACER.path:
+            self.log_status(f"Trace written to {TRACER.export_chrome()}")
+        if self.speech_listener is not None:
+            self.speech_listener.stop()
+            self.speech_listener.wait()
+        if self.summary_worker is not None:
+            self.summary_worker.wait()
+        if self.warmup_worker is not None:
+            self.warmup_worker.wait()
+        if self.preload_worker is not None:
+            self.preload_worker.wait()
+        if self.avatar_widget.asset_worker is not None:
+            self.avatar_widget.asset_worker.wait()
+        
+        # Free the server's memory now instead of after the keep-alive period (opt-in)
+        try:
+            self.llm.release()
+        except Exception as e:
+            self.log_status(f"Error unloading the language model: {e}")
+        self.status_sink.flush()
+        self.voice_handler.cleanup()
+        self.tts_service.shutdown()
+        super().closeEvent(event)
 
 # Main entry point
 if __name__ == "__main__":
+    startup = StartupProfile(STARTUP_ORIGIN)
+    startup.mark('imports')
     app = QApplication(sys.argv)
     
     # Enable GPU acceleration if available
     app.setAttribute(Qt.AA_UseDesktopOpenGL)
     app.setAttribute(Qt.AA_EnableHighDpiScaling)
     
-    window = AIAssistantApp()
+    startup.mark('qt')
+    window = AIAssistantApp(startup)
     window.show()
     sys.exit(app.exec_())
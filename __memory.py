@@ -0,0 +1,146 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+SUMMARY_PROMPT = """
+Summarize the conversation below for your own future reference. Keep names, facts,
+decisions, open questions and the user's preferences. Drop greetings and filler.
+Answer with the summary only, in at most 150 words.
+"""
+
+# Marks a recent message that was shortened to fit the budget
+TRUNCATED = "\n[...truncated]"
+
+
+class ConversationMemory:
+    """Role-tagged chat history trimmed against a token budget
+
+    The budget covers the whole request: system prompt, summary, recent turns
+    and the new prompt. Turns that no longer fit move to a pending list, and a
+    SummaryWorker later folds them into a running summary that is sent ahead of
+    the recent messages. The last `min_recent_turns` turns always stay, but
+    are cut short in the request when they alone are over the budget.
+    """
+
+    # A shortened message keeps at least this many tokens of its start
+    MIN_MESSAGE_TOKENS = 32
+
+    def __init__(self, max_tokens=2048, min_recent_turns=2):
+        self.max_tokens = max_tokens
+        self.min_recent_turns = min_recent_turns
+        # Tokens of the system prompt, known from the last build_messages()
+        self.reserved = 0
+        self.summary = ""
+        self.messages = []
+        self.pending = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Cheap token estimate: about four characters per token for English text"""
+        return len(text) // 4 + 1
+
+    def add_turn(self, user_input: str, response: str):
+        with self._lock:
+            self.messages.append({'role': 'user', 'content': user_input})
+            self.messages.append({'role': 'assistant', 'content': response})
+            self._trim(self.reserved)
+
+    def _budget(self, reserved):
+        return self.max_tokens - self.count_tokens(self.summary) - reserved
+
+    def _trim(self, reserved):
+        budget = self._budget(reserved)
+        while len(self.messages) > 2 * self.min_recent_turns:
+            used = sum(self.count_tokens(message['content']) for message in self.messages)
+            if used <= budget:
+                break
+            # Move the oldest user/assistant pair out of the prompt
+            self.pending.extend(self.messages[:2])
+            del self.messages[:2]
+
+    def _fit(self, budget):
+        """Copies of the recent messages, the oldest cut short first until they fit `budget`"""
+        messages = [dict(message) for message in self.messages]
+        excess = sum(self.count_tokens(message['content']) for message in messages) - budget
+        for message in messages:
+            if excess <= 0:
+                break
+            tokens = self.count_tokens(message['content'])
+            keep = max(tokens - excess, self.MIN_MESSAGE_TOKENS)
+            if keep >= tokens:
+                continue
+            message['content'] = message['content'][:keep * 4 - len(TRUNCATED)] + TRUNCATED
+            excess -= tokens - self.count_tokens(message['content'])
+        return messages
+
+    def build_messages(self, system_prompt: str, prompt: str) -> list:
+        """Messages for the next request: system prompt, summary, recent turns, new prompt"""
+        with self._lock:
+            self.reserved = self.count_tokens(system_prompt)
+            reserved = self.reserved + self.count_tokens(prompt)
+            self._trim(reserved)
+            messages = [{'role': 'system', 'content': system_prompt}]
+            if self.summary:
+                messages.append({
+                    'role': 'system',
+                    'content': f"Summary of the earlier conversation:\n{self.summary}"
+                })
+            messages.extend(self._fit(self._budget(reserved)))
+        messages.append({'role': 'user', 'content': prompt})
+        return messages
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self.pending)
+
+    def pending_snapshot(self):
+        """The current summary and the turns waiting to be folded into it"""
+        with self._lock:
+            return self.summary, list(self.pending)
+
+    def apply_summary(self, summary: str, folded: int):
+        """Replace the summary once the first `folded` pending messages are in it"""
+        with self._lock:
+            self.summary = summary.strip()
+            del self.pending[:folded]
+            self._trim(self.reserved)
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.messages.clear()
+            self.pending.clear()
+
+
+class SummaryWorker(QThread):
+    """Folds trimmed turns into the running summary at the lowest thread priority
+
+    The request starts with the chat's own system prompt so it shares the
+    prefix the server already has cached for the conversation.
+    """
+    finished = pyqtSignal(str, int)
+    error = pyqtSignal(str)
+
+    def __init__(self, client, system_prompt: str, summary: str, pending: list):
+        super().__init__()
+        self.client = client
+        self.system_prompt = system_prompt
+        self.summary = summary
+        self.pending = pending
+
+    def start(self):
+        super().start(QThread.LowestPriority)
+
+    def run(self):
+        transcript = "\n".join(f"{message['role'].capitalize()}: {message['content']}"
+                               for message in self.pending)
+        if self.summary:
+            transcript = f"Earlier summary:\n{self.summary}\n\nConversation:\n{transcript}"
+        try:
+            response = self.client.chat([
+                {'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': f"{SUMMARY_PROMPT}\n{transcript}"}
+            ])
+            self.finished.emit(response['message']['content'], len(self.pending))
+        except Exception as e:
+            self.error.emit(str(e))
@@ -0,0 +1,126 @@
+import re
+import threading
+from collections import OrderedDict
+from PyQt5.QtCore import QThread, pyqtSignal
+from __trace import TRACER
+
+# Opening fence with an optional language, up to the closing fence (or the end
+# of the text while a reply is still streaming in)
+FENCE = re.compile(r'^[ \t]*```[ \t]*([\w+#.-]*)[^\n]*\n(.*?)(?:(^[ \t]*```[ \t]*$)|\Z)', re.M | re.S)
+
+
+def split_markdown_blocks(text: str):
+    """Split Markdown into ('text', source) and ('code', source, language, closed) blocks"""
+    blocks = []
+    pos = 0
+    for match in FENCE.finditer(text):
+        if match.start() > pos:
+            blocks.append(('text', text[pos:match.start()]))
+        closed = match.group(3) is not None
+        blocks.append(('code', match.group(2), match.group(1).lower(), closed))
+        pos = match.end()
+    if pos < len(text):
+        blocks.append(('text', text[pos:]))
+    return blocks
+
+
+class MarkdownRenderer:
+    """Markdown to HTML with one reused parser and a cache of finished blocks
+
+    Prose goes through a single markdown.Markdown instance that is reset()
+    between blocks instead of being rebuilt. Code blocks are highlighted with
+    Pygments directly. Every block except the last one of a message is
+    finished, so re-rendering a growing reply only converts its tail.
+    """
+
+    EXTENSIONS = [
+        'tables',
+        'nl2br',  # Convert newlines to <br>
+        'sane_lists'  # Better list handling
+    ]
+
+    def __init__(self, cache_size=512):
+        # Loaded by the render thread on first use rather than at start-up
+        import markdown
+        from pygments.formatters import HtmlFormatter
+        
+        self.md = markdown.Markdown(extensions=self.EXTENSIONS)
+        self.formatter = HtmlFormatter(cssclass='codehilite')
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def render(self, text: str) -> str:
+        blocks = split_markdown_blocks(text)
+        html = []
+        for index, block in enumerate(blocks):
+            finished = index < len(blocks) - 1 or (block[0] == 'code' and block[3])
+            html.append(self._render_block(block, finished))
+        return ''.join(html)
+
+    def _render_block(self, block, finished):
+        key = block[:3]
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        if block[0] == 'code':
+            html = self.highlight(block[1], block[2])
+        else:
+            self.md.reset()
+            html = self.md.convert(block[1])
+
+        # A block that is still growing will never be asked for again
+        if finished:
+            self.cache[key] = html
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return html
+
+    def highlight(self, code: str, language: str) -> str:
+        from pygments import highlight
+        from pygments.lexers import get_lexer_by_name
+        from pygments.lexers.special import TextLexer
+        from pygments.util import ClassNotFound
+        
+        try:
+            lexer = get_lexer_by_name(language) if language else TextLexer()
+        except ClassNotFound:
+            lexer = TextLexer()
+        return highlight(code, lexer, self.formatter)
+
+
+class RenderWorker(QThread):
+    """Renders Markdown off the GUI thread, keeping only the newest text per message"""
+    rendered = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.running = True
+
+    def request(self, key: int, text: str, trace_id: str = None):
+        """Queue text for rendering; an older request for the same key is replaced"""
+        with self.condition:
+            self.pending[key] = (text, trace_id)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        # The parser is not thread-safe, so it lives on this thread only
+        renderer = MarkdownRenderer()
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                key, (text, trace_id) = self.pending.popitem(last=False)
+            with TRACER.span('markdown.render', trace_id, chars=len(text)):
+                html = renderer.render(text)
+            self.rendered.emit(key, html)
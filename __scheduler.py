@@ -0,0 +1,136 @@
+import time
+import itertools
+from collections import deque
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+TURN_POLICIES = ('preempt', 'queue')
+
+# How often finished worker threads are collected (ms)
+REAP_INTERVAL = 250
+
+
+class Turn:
+    """One question and every worker producing its reply"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, text: str, trace_id: str = None):
+        self.id = next(self._ids)
+        self.text = text
+        self.trace_id = trace_id
+        self.started = None
+        self.cancelled = False
+        self.workers = []
+        # Set by the window while the turn runs
+        self.ollama_worker = None
+        self.voice_worker = None
+        self.splitter = None
+        self.reply = None
+        self.generating = False
+
+    def generation_done(self, *args):
+        """Connected to the language model worker's finished and error signals"""
+        self.generating = False
+
+
+class TurnScheduler(QObject):
+    """Owns every in-flight turn and the worker threads behind it
+
+    submit() either pre-empts the running turn or queues behind it,
+    depending on `policy`. Cancelling a turn tells its workers to stop at
+    their next chance and stops playback at once; the workers stay
+    referenced here until their threads have actually exited, so an
+    abandoned worker is never destroyed while running and never reports
+    into a newer turn.
+    """
+
+    started = pyqtSignal(object)
+    cancelled = pyqtSignal(object)
+
+    def __init__(self, player, policy='preempt', parent=None):
+        super().__init__(parent)
+        if policy not in TURN_POLICIES:
+            raise ValueError(f"Unknown turn policy: {policy}")
+        self.player = player
+        self.policy = policy
+        self.active = None
+        self.pending = deque()
+        self.running = set()
+        
+        # The workers declare their own `finished`, which hides QThread's, so
+        # exited threads are found by polling while any are running
+        self.reaper = QTimer(self)
+        self.reaper.setInterval(REAP_INTERVAL)
+        self.reaper.timeout.connect(self._reap)
+
+    def submit(self, turn: Turn):
+        """Run the turn now, or once the active one is done under the 'queue' policy"""
+        if self.active is not None:
+            if self.policy == 'queue':
+                self.pending.append(turn)
+                return False
+            self.cancel(self.active)
+        self._start(turn)
+        return True
+
+    def start_worker(self, turn: Turn, worker: QThread):
+        """Start a worker on behalf of a turn and keep it alive until its thread exits"""
+        turn.workers.append(worker)
+        self.running.add(worker)
+        worker.start()
+        if not self.reaper.isActive():
+            self.reaper.start()
+
+    def finish(self, turn: Turn):
+        """Called once a turn's reply has been generated and played out"""
+        if turn is not self.active:
+            return
+        self.active = None
+        if self.pending:
+            self._start(self.pending.popleft())
+
+    def cancel(self, turn: Turn = None):
+        """Stop a turn (the active one by default); queued turns are simply dropped"""
+        turn = turn or self.active
+        if turn is None or turn.cancelled:
+            return
+        turn.cancelled = True
+        if turn in self.pending:
+            self.pending.remove(turn)
+            return
+        for worker in turn.workers:
+            if worker in self.running:
+                worker.cancel()
+        self.player.stop()
+        was_active = turn is self.active
+        if was_active:
+            self.active = None
+        self.cancelled.emit(turn)
+        if was_active and self.pending:
+            self._start(self.pending.popleft())
+
+    def generating(self) -> bool:
+        """Whether the language model is working on the active turn"""
+        return self.active is not None and self.active.generating
+
+    def shutdown(self):
+        """Cancel everything and wait for every worker thread to exit"""
+        self.pending.clear()
+        self.cancel()
+        for worker in list(self.running):
+            worker.cancel()
+            worker.wait()
+        self._reap()
+
+    def _start(self, turn: Turn):
+        self.active = turn
+        turn.started = time.perf_counter_ns()
+        self.started.emit(turn)
+
+    def _reap(self):
+        for worker in [worker for worker in self.running if worker.isFinished()]:
+            # Deleting the thread object also drops the slots connected to it
+            self.running.discard(worker)
+            worker.deleteLater()
+        if not self.running:
+            self.reaper.stop()
@@ -0,0 +1,202 @@
+import os
+import json
+import logging
+from collections import deque
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+DEFAULT_VOSK_MODEL = os.environ.get('AI_ASSISTANT_VOSK_MODEL', 'models/vosk')
+
+
+class SpeechBackend:
+    """Streaming recognizer interface: feed 16-bit mono PCM, read partial and final text"""
+
+    def start(self, sample_rate: int):
+        raise NotImplementedError
+
+    def accept(self, pcm: bytes) -> str:
+        """Feed audio and return the best transcript so far"""
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        """Flush the recognizer and return the final transcript"""
+        raise NotImplementedError
+
+
+class VoskBackend(SpeechBackend):
+    """Offline Kaldi recognizer from the vosk package, runs on one CPU core"""
+
+    def __init__(self, model_path=DEFAULT_VOSK_MODEL):
+        # Optional dependency, only needed when voice input is used
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.recognizer = None
+        self.segments = []
+
+    def start(self, sample_rate):
+        self.recognizer = self.vosk.KaldiRecognizer(self.model, sample_rate)
+        self.segments = []
+
+    def accept(self, pcm):
+        # A True result means vosk closed an internal segment at a pause
+        if self.recognizer.AcceptWaveform(pcm):
+            text = json.loads(self.recognizer.Result()).get('text', '')
+            if text:
+                self.segments.append(text)
+            partial = ''
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        return ' '.join(self.segments + ([partial] if partial else []))
+
+    def finish(self):
+        text = json.loads(self.recognizer.FinalResult()).get('text', '')
+        if text:
+            self.segments.append(text)
+        return ' '.join(self.segments)
+
+
+class EnergyVAD:
+    """Energy-based voice activity detection with an adaptive noise floor
+
+    The first calibration_ms of quiet audio are taken as background noise;
+    frames louder than NOISE_CEILING_DB never count towards it, so someone
+    who starts talking right away is not mistaken for the room. After that a
+    frame is speech when it is margin_db above the running noise estimate,
+    which keeps following the room during non-speech frames. The estimate
+    outlives reset(), so one detector should be kept for every session. The
+    utterance ends once endpoint_ms of silence follows at least
+    min_speech_ms of speech.
+    """
+
+    # Calibration frames louder than this (dBFS) are taken to be speech
+    NOISE_CEILING_DB = -35.0
+
+    def __init__(self, margin_db=12.0, endpoint_ms=700, min_speech_ms=200,
+                 calibration_ms=300, frame_ms=FRAME_MS):
+        self.margin_db = margin_db
+        self.calibration_frames = calibration_ms // frame_ms
+        self.endpoint_frames = endpoint_ms // frame_ms
+        self.min_speech_frames = min_speech_ms // frame_ms
+        self.noise_db = -50.0
+        self.noise_frames = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new utterance; the noise estimate is kept"""
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.triggered = False
+
+    @staticmethod
+    def level_db(pcm: bytes) -> float:
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+        rms = np.sqrt(np.mean(samples * samples)) if len(samples) else 0.0
+        return 20 * np.log10(max(rms, 1e-6))
+
+    def process(self, pcm: bytes) -> bool:
+        """Update with one frame; returns whether the frame counts as speech"""
+        level = self.level_db(pcm)
+        if self.noise_frames < self.calibration_frames and level < self.NOISE_CEILING_DB:
+            # Running mean of the room noise, from quiet frames only
+            self.noise_frames += 1
+            self.noise_db = level if self.noise_frames == 1 else self.noise_db + (level - self.noise_db) / self.noise_frames
+            return False
+
+        is_speech = level > self.noise_db + self.margin_db
+
+        if is_speech:
+            self.speech_frames += 1
+            self.silence_frames = 0
+            if self.speech_frames >= self.min_speech_frames:
+                self.triggered = True
+        else:
+            # Track the noise floor only while nobody is talking
+            self.noise_db += 0.05 * (level - self.noise_db)
+            self.silence_frames += 1
+            if not self.triggered:
+                self.speech_frames = 0
+        return is_speech
+
+    def endpoint(self) -> bool:
+        return self.triggered and self.silence_frames >= self.endpoint_frames
+
+
+class SpeechListener(QThread):
+    """Captures one spoken query from the microphone and transcribes it as it is spoken"""
+    partial = pyqtSignal(str)
+    final = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, backend: SpeechBackend = None, vad: EnergyVAD = None,
+                 pre_roll_ms=300, timeout_s=30):
+        super().__init__()
+        self.backend = backend
+        self.vad = vad or EnergyVAD()
+        self.pre_roll = deque(maxlen=pre_roll_ms // FRAME_MS)
+        self.max_frames = timeout_s * 1000 // FRAME_MS
+        self.running = True
+        self.logger = logging.getLogger(__name__)
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        audio = None
+        stream = None
+        try:
+            # pyaudio is what speech_recognition's Microphone uses as well; a
+            # missing package or audio system is reported like any other failure
+            import pyaudio
+            audio = pyaudio.PyAudio()
+
+            # Loading a model takes a while, so do it here rather than on the GUI thread
+            if self.backend is None:
+                self.backend = VoskBackend()
+            stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE,
+                                input=True, frames_per_buffer=FRAME_SAMPLES)
+            self.backend.start(SAMPLE_RATE)
+            self.vad.reset()
+            self.pre_roll.clear()
+            last_partial = ''
+
+            for _ in range(self.max_frames):
+                if not self.running:
+                    break
+                frame = stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+                self.vad.process(frame)
+
+                if not self.vad.triggered:
+                    # Keep the audio just before speech starts so the first word is not clipped
+                    self.pre_roll.append(frame)
+                    continue
+
+                if self.pre_roll:
+                    frame = b''.join(self.pre_roll) + frame
+                    self.pre_roll.clear()
+
+                text = self.backend.accept(frame)
+                if text and text != last_partial:
+                    last_partial = text
+                    self.partial.emit(text)
+
+                if self.vad.endpoint():
+                    break
+
+            text = self.backend.finish() if self.vad.triggered else ''
+            self.final.emit(text.strip())
+        except Exception as e:
+            self.logger.error(f"Speech input failed: {e}")
+            self.error.emit(str(e))
+        finally:
+            self.running = False
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+            if audio is not None:
+                audio.terminate()
@@ -0,0 +1,80 @@
+import re
+from __render import split_markdown_blocks
+
+# Names to read out for common fence languages; others are used as written
+LANGUAGE_NAMES = {
+    'py': 'Python', 'python': 'Python', 'js': 'JavaScript', 'javascript': 'JavaScript',
+    'ts': 'TypeScript', 'typescript': 'TypeScript', 'sh': 'shell', 'bash': 'shell',
+    'shell': 'shell', 'cpp': 'C++', 'c++': 'C++', 'cs': 'C#', 'csharp': 'C#',
+    'html': 'HTML', 'css': 'CSS', 'sql': 'SQL', 'json': 'JSON', 'yaml': 'YAML',
+}
+
+
+class SpeechNormalizer:
+    """Turns Markdown into text that can be read aloud
+
+    Fenced code is found with the same block splitter the chat renderer uses,
+    and is skipped or replaced by a one-line summary depending on
+    `code_policy`. Everything else goes through one compiled tokenizer whose
+    alternatives are tried left to right at each position, so inline code is
+    taken before any emphasis inside it, and underscores only count as
+    emphasis at word boundaries (snake_case is left alone).
+    """
+
+    CODE_POLICIES = ('skip', 'summarize')
+
+    TOKEN = re.compile(r"""
+        # Cheap check that lets plain prose skip every alternative below
+        (?=[\\`!\[<*_~|{}\]>]|^)
+        (?:(?P<escape>\\[\\`*_{}\[\]()#+\-.!|~])
+      | (?P<tick>`+)[ ]?(?P<code>.+?)[ ]?(?P=tick)
+      | !?\[(?P<label>[^\]\n]*)\]\([^)\n]*\)
+      | </?[A-Za-z!][^>\n]*>
+      | ^[ \t]*\|?(?:[ \t]*:?-+:?[ \t]*\|)+[ \t]*(?::?-+:?[ \t]*)?$
+      | ^[ \t]*(?:[-*_][ \t]*){3,}$
+      | ^[ \t]*(?:\#{1,6}[ \t]+|>[ \t]?|[-*+][ \t]+|\d+[.)][ \t]+)
+      | (?P<mark>\*{1,3}|~~)(?=\S)(?P<marked>.+?)(?<=\S)(?P=mark)
+      | (?<!\w)(?P<under>_{1,3})(?=\S)(?P<underlined>.+?)(?<=\S)(?P=under)(?!\w)
+      | [ \t]*\|[ \t]*
+      | [~\[\]{}<>`])
+    """, re.M | re.X)
+
+    def __init__(self, code_policy='summarize'):
+        if code_policy not in self.CODE_POLICIES:
+            raise ValueError(f"Unknown code policy: {code_policy}")
+        self.code_policy = code_policy
+
+    def normalize(self, text: str) -> str:
+        """Speakable version of a piece of Markdown, one line per paragraph or list item"""
+        parts = []
+        for block in split_markdown_blocks(text):
+            part = self.speak_code(block[1], block[2]) if block[0] == 'code' else self.speak_text(block[1])
+            if part:
+                parts.append(part)
+        return '\n'.join(parts)
+
+    def speak_text(self, text: str) -> str:
+        text = self.TOKEN.sub(self._replace, text)
+        lines = (' '.join(line.split()) for line in text.split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+    def speak_code(self, code: str, language: str) -> str:
+        if self.code_policy == 'skip':
+            return ''
+        lines = len(code.rstrip('\n').split('\n'))
+        name = LANGUAGE_NAMES.get(language, language) or 'code'
+        return f"There is a {lines}-line {name} snippet in the chat."
+
+    def _replace(self, match):
+        if match.group('escape'):
+            return match.group('escape')[1]
+        if match.group('code') is not None:
+            return match.group('code')
+        if match.group('label') is not None:
+            return match.group('label')
+        if match.group('marked') is not None:
+            return self.TOKEN.sub(self._replace, match.group('marked'))
+        if match.group('underlined') is not None:
+            return self.TOKEN.sub(self._replace, match.group('underlined'))
+        # Table pipes separate words; every other token is markup only
+        return ' ' if '|' in match.group() else ''
@@ -0,0 +1,80 @@
+import time
+import logging
+import importlib
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Modules that are slow to import but needed for the first spoken reply. They are
+# loaded on a background thread once the window is up instead of before it.
+PRELOAD_MODULES = ['scipy.signal', 'soundfile', 'markdown', 'pygments.lexers', 'pygments.formatters']
+
+
+class StartupProfile:
+    """Wall-clock marks for the phases of application start-up
+
+    Times are measured from `origin`, which the entry script takes before its
+    own imports. Once every expected phase has been marked, report() gives a
+    single line that can be compared between runs.
+    """
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.marks = []
+        self.expected = set()
+        self.reported = False
+        self.logger = logging.getLogger(__name__)
+
+    def expect(self, *phases):
+        self.expected.update(phases)
+
+    def mark(self, phase) -> bool:
+        """Record the end of a phase; returns True when the last expected phase is in"""
+        if any(name == phase for name, _ in self.marks):
+            return False
+        self.marks.append((phase, time.perf_counter() - self.origin))
+        self.expected.discard(phase)
+        return not self.expected
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def report(self) -> str:
+        parts = []
+        previous = 0.0
+        for phase, seconds in self.marks:
+            parts.append(f"{phase} {seconds * 1000:.0f} ms (+{(seconds - previous) * 1000:.0f})")
+            previous = seconds
+        self.reported = True
+        return "Startup: " + ", ".join(parts)
+
+
+class PreloadWorker(QThread):
+    """Imports heavy modules in the background so their first real use is fast
+
+    `tasks` are further callables that would otherwise slow down start-up,
+    such as scanning a cache directory; they run after the imports.
+    """
+    finished = pyqtSignal(float)
+
+    def __init__(self, modules=None, tasks=()):
+        super().__init__()
+        self.modules = modules if modules is not None else PRELOAD_MODULES
+        self.tasks = list(tasks)
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        # Imports hold the GIL a lot; keep them behind the GUI thread
+        super().start(QThread.LowPriority)
+
+    def run(self):
+        start = time.perf_counter()
+        for name in self.modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                self.logger.warning(f"Could not preload {name}: {e}")
+        for task in self.tasks:
+            try:
+                task()
+            except Exception as e:
+                self.logger.warning(f"Start-up task {getattr(task, '__qualname__', task)} failed: {e}")
+        self.finished.emit(time.perf_counter() - start)
@@ -0,0 +1,59 @@
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from PyQt5.QtCore import QObject, QTimer
+
+
+class StatusLog(QObject):
+    """Status log sink that any thread can write to
+
+    Entries wait in a bounded queue and are shown in the widget in batches
+    from a GUI-thread timer, so a burst of progress messages costs one append
+    per flush instead of one document rebuild per message. The widget itself
+    keeps the history, capped at `capacity` lines. Entries can also be
+    mirrored to a rotating log file.
+    """
+
+    def __init__(self, widget, capacity=500, flush_interval=100,
+                 log_file=None, max_file_bytes=1024 * 1024, backup_count=3):
+        super().__init__(widget)
+        self.widget = widget
+        self.widget.setMaximumBlockCount(capacity)
+        self.pending = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+        self.file_logger = None
+        if log_file:
+            handler = RotatingFileHandler(log_file, maxBytes=max_file_bytes,
+                                          backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.file_logger = logging.getLogger('ai_assistant.status')
+            self.file_logger.setLevel(logging.INFO)
+            self.file_logger.propagate = False
+            self.file_logger.addHandler(handler)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(flush_interval)
+
+    def write(self, message: str):
+        """Record a message; safe to call from any thread"""
+        entry = f"[{time.strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            self.pending.append(entry)
+        if self.file_logger:
+            self.file_logger.info(message)
+
+    def flush(self):
+        """Show everything written since the last flush (GUI thread)"""
+        with self._lock:
+            if not self.pending:
+                return
+            lines = list(self.pending)
+            self.pending.clear()
+
+        self.widget.appendPlainText('\n'.join(lines))
+        scrollbar = self.widget.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import itertools
+import threading
+from collections import deque, OrderedDict
+
+# Lightweight spans for following one turn through the LLM, speech and playback
+# stages. Tracing is off unless AI_ASSISTANT_TRACE is set; its value is where the
+# Chrome trace (chrome://tracing, Perfetto) is written on exit, or "1" to only
+# log the per-turn summaries. While off, span() hands back a shared no-op object.
+
+TRACE_ENV = 'AI_ASSISTANT_TRACE'
+DEFAULT_TRACE_FILE = 'ai_assistant_trace.json'
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'trace_id', 'args', 'start')
+
+    def __init__(self, tracer, name, trace_id, args):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.trace_id, **self.args)
+        return False
+
+    def set(self, **args):
+        """Attach values only known once the span is running"""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects timed spans tagged with the trace id of the turn they belong to
+
+    A thread picks up a trace id with activate(); spans opened on that thread
+    without an explicit id join that trace. Events are kept in a bounded ring,
+    so a long session cannot grow without limit.
+    """
+
+    def __init__(self, enabled=False, path=None, capacity=200000):
+        self.enabled = enabled
+        self.path = path
+        self.events = deque(maxlen=capacity)
+        self.thread_names = {}
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    @classmethod
+    def from_environment(cls):
+        value = os.environ.get(TRACE_ENV, '').strip()
+        if not value or value == '0':
+            return cls()
+        return cls(enabled=True, path=None if value == '1' else value)
+
+    def new_trace(self) -> str:
+        """A short id for a new turn, or None while tracing is off"""
+        if not self.enabled:
+            return None
+        return f"{os.getpid() % 0x10000:04x}{next(self._ids):04x}"
+
+    def activate(self, trace_id, thread_name=None):
+        """Make trace_id the current trace of this thread for the duration of a with block"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Activation(self, trace_id, thread_name)
+
+    def current(self):
+        return getattr(self._local, 'trace_id', None)
+
+    def span(self, name, trace_id=None, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, trace_id or self.current(), args)
+
+    def record(self, name, start_ns, end_ns, trace_id=None, **args):
+        """Add a span measured elsewhere, e.g. one that starts and ends in different callbacks"""
+        if not self.enabled:
+            return
+        thread = threading.get_ident()
+        event = (name, trace_id or self.current(), thread, start_ns, end_ns, args)
+        with self._lock:
+            if thread not in self.thread_names:
+                self.thread_names[thread] = threading.current_thread().name
+            self.events.append(event)
+
+    def summary(self, trace_id) -> "OrderedDict[str, tuple]":
+        """Stage name -> (count, total seconds) for one trace, in order of first appearance"""
+        stages = OrderedDict()
+        with self._lock:
+            events = [event for event in self.events if event[1] == trace_id]
+        for name, _, _, start, end, _ in events:
+            count, total = stages.get(name, (0, 0.0))
+            stages[name] = (count + 1, total + (end - start) / 1e9)
+        return stages
+
+    def format_summary(self, trace_id) -> str:
+        parts = []
+        for name, (count, total) in self.summary(trace_id).items():
+            part = f"{name} {total * 1000:.0f} ms"
+            if count > 1:
+                part += f" x{count}"
+            parts.append(part)
+        return f"Trace {trace_id}: " + (", ".join(parts) if parts else "no spans")
+
+    def export_chrome(self, path=None):
+        """Write all spans as Chrome trace-event JSON and return the path"""
+        path = path or self.path or DEFAULT_TRACE_FILE
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = list(self.thread_names.items())
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread, 'args': {'name': name}}
+            for thread, name in threads
+        ]
+        for name, trace_id, thread, start, end, args in events:
+            trace_events.append({
+                'name': name,
+                'cat': name.split('.')[0],
+                'ph': 'X',
+                'ts': (start - self._origin) / 1000,
+                'dur': (end - start) / 1000,
+                'pid': pid,
+                'tid': thread,
+                'args': dict(args, trace_id=trace_id),
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+
+class _Activation:
+    def __init__(self, tracer, trace_id, thread_name):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.thread_name = thread_name
+
+    def __enter__(self):
+        local = self.tracer._local
+        self.previous = getattr(local, 'trace_id', None)
+        local.trace_id = self.trace_id
+        if self.thread_name:
+            with self.tracer._lock:
+                self.tracer.thread_names[threading.get_ident()] = self.thread_name
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._local.trace_id = self.previous
+        return False
+
+
+# Shared by every module in the process
+TRACER = Tracer.from_environment()
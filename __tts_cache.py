@@ -0,0 +1,158 @@
+import os
+import io
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+
+# soundfile loads libsndfile through cffi, so it is imported on first use
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'ai_assistant' / 'tts'
+
+
+class TTSCache:
+    """On-disk LRU cache of processed sentence audio, stored as FLAC
+
+    Entries are keyed by a stable digest of everything that shapes the sound,
+    so they survive restarts and are shared by every VoiceHandler. Reading an
+    entry refreshes its modification time, and the least recently used files
+    are deleted once the cache grows past max_bytes. The size on disk takes a
+    scan of every entry, so it is only measured by measure(), off the GUI
+    thread, or on the first put().
+    """
+
+    SUFFIX = '.flac'
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = None
+
+    @staticmethod
+    def key(text: str, voice: dict, effects: list) -> str:
+        """Digest of the sentence, the TTS voice settings and the effect parameters"""
+        payload = json.dumps([text, voice, effects], sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.SUFFIX}"
+
+    def _entries(self):
+        return self.directory.glob(f"*/*{self.SUFFIX}")
+
+    def measure(self):
+        """Total the size of the entries on disk, once"""
+        if self.size is not None:
+            return
+        size = 0
+        for path in self._entries():
+            try:
+                size += path.stat().st_size
+            except OSError:
+                continue
+        with self._lock:
+            if self.size is None:
+                self.size = size
+
+    def get(self, key: str):
+        """Return (int16 PCM bytes, sample rate) or None on a miss"""
+        import soundfile as sf
+        path = self._path(key)
+        try:
+            pcm, sample_rate = sf.read(str(path), dtype='int16')
+            os.utime(path)
+        except (OSError, RuntimeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return pcm.tobytes(), sample_rate
+
+    def put(self, key: str, pcm: bytes, sample_rate: int):
+        """Store processed audio, evicting old entries if the cache is full
+
+        A cache that cannot be written (full disk, read-only directory) only
+        logs a warning; the audio has been made already and is still played.
+        """
+        import soundfile as sf
+        self.measure()
+        path = self._path(key)
+        # Write to a temporary name first so readers never see a partial file
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            data = io.BytesIO()
+            sf.write(data, np.frombuffer(pcm, dtype=np.int16), sample_rate, format='FLAC', subtype='PCM_16')
+            data = data.getvalue()
+
+            path.parent.mkdir(exist_ok=True)
+            previous = path.stat().st_size if path.exists() else 0
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except (OSError, RuntimeError) as e:
+            self.logger.warning(f"Could not store TTS cache entry {key[:12]}: {e}")
+            try:
+                temp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self.size += len(data) - previous
+            over_budget = self.size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        with self._lock:
+            self.size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if self.size <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                self.size -= size
+                self.evictions += 1
+
+    def clear(self):
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes': self.size or 0,
+            }
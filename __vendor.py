@@ -0,0 +1,63 @@
+import sys
+import hashlib
+import urllib.request
+from pathlib import Path
+
+# Downloads the three.js r128 scripts the avatar viewer needs, and three's license,
+# into web/vendor/three, so the viewer starts without network access. Run it once
+# after checkout (or on a connected machine before copying the tree to an
+# air-gapped one) and commit the result. `python __vendor.py --check` only reports
+# missing files and exits non-zero, for use as a packaging step.
+
+THREE_VERSION = '0.128.0'
+BASE_URL = f"https://cdn.jsdelivr.net/npm/three@{THREE_VERSION}"
+FILES = {
+    'three.min.js': f"{BASE_URL}/build/three.min.js",
+    'OrbitControls.js': f"{BASE_URL}/examples/js/controls/OrbitControls.js",
+    'GLTFLoader.js': f"{BASE_URL}/examples/js/loaders/GLTFLoader.js",
+    'LICENSE': f"{BASE_URL}/LICENSE",
+}
+VENDOR_DIR = Path(__file__).resolve().parent / 'web' / 'vendor' / 'three'
+
+
+def missing_files() -> list:
+    return [name for name in FILES if not (VENDOR_DIR / name).exists()]
+
+
+def fetch(name, url, force=False):
+    path = VENDOR_DIR / name
+    if path.exists() and not force:
+        print(f"{name}: already vendored")
+        return path
+
+    with urllib.request.urlopen(url, timeout=30) as response:
+        data = response.read()
+    path.write_bytes(data)
+    print(f"{name}: {len(data) / 1024:.0f} KiB sha256={hashlib.sha256(data).hexdigest()}")
+    return path
+
+
+def main():
+    if '--check' in sys.argv[1:]:
+        missing = missing_files()
+        if missing:
+            print(f"three.js r128 is not vendored, missing from {VENDOR_DIR}: {', '.join(missing)}")
+            print("Run 'python __vendor.py' on a machine with network access and commit the files.")
+            return 1
+        print(f"three@{THREE_VERSION} is vendored in {VENDOR_DIR}")
+        return 0
+
+    force = '--force' in sys.argv[1:]
+    VENDOR_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        for name, url in FILES.items():
+            fetch(name, url, force)
+    except OSError as e:
+        print(f"Could not download three.js: {e}")
+        return 1
+    (VENDOR_DIR / 'VERSION').write_text(f"three@{THREE_VERSION}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,74 +1,265 @@
 import sys
-from pathlib import Path
+import os
+import time
 import tempfile
 import logging
 import numpy as np
-import librosa
-import speech_recognition as sr
-from pydub import AudioSegment
-import pyttsx3
-from PyQt5.QtCore import QThread, pyqtSignal, QObject
+from PyQt5.QtCore import QThread, pyqtSignal, QObject, QBuffer, QByteArray, QIODevice
+from PyQt5.QtMultimedia import QAudio, QAudioFormat, QAudioOutput
 from PyQt5.QtWidgets import QApplication
+from collections import deque
 import queue
 import threading
+import itertools
+import multiprocessing
 import warnings
 import re
+import wave
+from __effects import EffectChain, default_voice_effects, to_float32, to_int16
+from __tts_cache import TTSCache
+from __lipsync import viseme_track
+from __trace import TRACER
+from __speech_text import SpeechNormalizer
 warnings.filterwarnings("ignore")
 
+class SentenceSplitter:
+    """Cuts streamed text into sentences that can be spoken on their own
+    
+    A complete reply goes through the same splitter (see VoiceWorker), so
+    both paths agree on abbreviations, list numbers and code blocks.
+    """
+    
+    # Sentence-ending punctuation (plus closing quotes/brackets) or a line break
+    BOUNDARY = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+    FENCE = '```'
+    # Like the renderer, only a fence on a line of its own closes a code block
+    CLOSING_FENCE = re.compile(r'^[ \t]*```[ \t]*$', re.M)
+    ABBREVIATIONS = ('e.g.', 'i.e.', 'mr.', 'mrs.', 'ms.', 'dr.', 'vs.', 'etc.')
+    
+    def __init__(self):
+        self.buffer = ""
+        # Whether the buffer starts a new line; fences only count there
+        self.line_start = True
+    
+    def feed(self, text: str) -> list:
+        """Add streamed text and return every sentence that is now complete"""
+        self.buffer += text
+        sentences = []
+        while True:
+            sentence = self._next_sentence()
+            if sentence is None:
+                break
+            if sentence.strip():
+                sentences.append(sentence.strip())
+        return sentences
+    
+    def flush(self) -> list:
+        """Return whatever is left once the stream has ended"""
+        rest, self.buffer = self.buffer.strip(), ""
+        self.line_start = True
+        return [rest] if rest else []
+    
+    def _next_sentence(self):
+        stripped = self.buffer.lstrip(' \t')
+        if self.line_start and stripped.startswith(self.FENCE):
+            # Keep fenced code blocks together until the closing fence line
+            start = len(self.buffer) - len(stripped) + len(self.FENCE)
+            close = self.CLOSING_FENCE.search(self.buffer, start)
+            # The closing line is only complete once its line break has arrived
+            if close is None or close.end() == len(self.buffer):
+                return None
+            sentence, self.buffer = self.buffer[:close.end()], self.buffer[close.end():]
+            self.line_start = False
+            return sentence
+        
+        pos = 0
+        while True:
+            match = self.BOUNDARY.search(self.buffer, pos)
+            if match is None:
+                return None
+            sentence = self.buffer[:match.start()]
+            if '\n' not in match.group() and self._is_incomplete(sentence):
+                pos = match.end()
+                continue
+            self.buffer = self.buffer[match.end():]
+            self.line_start = '\n' in match.group()
+            return sentence
+    
+    def _is_incomplete(self, sentence: str) -> bool:
+        """Dots after abbreviations and list numbers do not end a sentence"""
+        words = sentence.split()
+        if not words:
+            return True
+        last = words[-1].lower()
+        return last in self.ABBREVIATIONS or (len(words) == 1 and last[:-1].isdigit())
+
+
+def _tts_service_main(requests, results, voice_index, rate, volume):
+    """Entry point of the TTS process, which owns one pyttsx3 engine for its whole life"""
+    # Imported here so only the TTS process loads the speech engine
+    import pyttsx3
+    engine = pyttsx3.init()
+    voices = engine.getProperty('voices')
+    if len(voices) > voice_index:
+        engine.setProperty('voice', voices[voice_index].id) # its MS hazel don't hate me for not using jenny but she is far slower.
+    engine.setProperty('rate', rate)
+    engine.setProperty('volume', volume)
+    
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        
+        job_id, text = request
+        # pyttsx3 can only render to a file, so use a scratch file that never outlives the job
+        fd, scratch_path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            engine.save_to_file(text, scratch_path)
+            engine.runAndWait()
+            with wave.open(scratch_path, 'rb') as wav:
+                if wav.getsampwidth() != 2:
+                    raise ValueError(f"Expected 16-bit audio, got {8 * wav.getsampwidth()}-bit")
+                audio = (wav.readframes(wav.getnframes()), wav.getframerate(), wav.getnchannels())
+            results.put((job_id, audio, None))
+        except Exception as e:
+            results.put((job_id, None, str(e)))
+        finally:
+            os.remove(scratch_path)
+    
+    engine.stop()
+
+
+class TTSService:
+    """Long-lived pyttsx3 process that synthesizes requests from a queue"""
+    
+    def __init__(self, voice_index=2, rate=160, volume=0.8):
+        self.voice_index = voice_index
+        self.rate = rate
+        self.volume = volume
+        self.logger = logging.getLogger(__name__)
+        self.process = None
+        self._job_ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    def params(self) -> dict:
+        """Settings that change how synthesized speech sounds"""
+        return {'voice_index': self.voice_index, 'rate': self.rate, 'volume': self.volume}
+    
+    def start(self):
+        """Spawn the engine process; runAndWait is not safe to share between threads"""
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(
+            target=_tts_service_main,
+            args=(self.requests, self.results, self.voice_index, self.rate, self.volume),
+            daemon=True
+        )
+        self.process.start()
+        
+        # Route results back to whichever thread is waiting on them
+        self.result_thread = threading.Thread(target=self._collect_results, daemon=True)
+        self.result_thread.start()
+    
+    def _collect_results(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                break
+            
+            job_id, audio, error = result
+            with self._lock:
+                waiter = self._pending.pop(job_id, None)
+            if waiter:
+                waiter['audio'] = audio
+                waiter['error'] = error
+                waiter['done'].set()
+    
+    def synthesize(self, text: str, timeout: float = 60):
+        """Return (int16 PCM bytes, sample rate, channels) for text, blocking until done"""
+        if self.process is None or not self.process.is_alive():
+            raise RuntimeError("TTS service is not running")
+        
+        job_id = next(self._job_ids)
+        waiter = {'done': threading.Event(), 'audio': None, 'error': None}
+        with self._lock:
+            self._pending[job_id] = waiter
+        self.requests.put((job_id, text))
+        
+        # Wait in short slices so a crashed engine process fails fast
+        deadline = time.monotonic() + timeout
+        while not waiter['done'].wait(0.25):
+            if not self.process.is_alive() or time.monotonic() > deadline:
+                with self._lock:
+                    self._pending.pop(job_id, None)
+                if not self.process.is_alive():
+                    raise RuntimeError("TTS service process exited")
+                raise TimeoutError(f"TTS request timed out after {timeout}s")
+        if waiter['error']:
+            raise RuntimeError(waiter['error'])
+        return waiter['audio']
+    
+    def shutdown(self, timeout: float = 5):
+        """Stop the engine process and the result thread"""
+        if self.process is None:
+            return
+        
+        self.requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.logger.warning("TTS service did not exit in time, terminating it")
+            self.process.terminate()
+            self.process.join()
+        
+        self.results.put(None)
+        self.result_thread.join()
+        self.process = None
+        
+        # Release anyone still waiting on a request that will never finish
+        with self._lock:
+            waiters, self._pending = list(self._pending.values()), {}
+        for waiter in waiters:
+            waiter['error'] = "TTS service was shut down"
+            waiter['done'].set()
+
+
 class VoiceHandler(QObject):
     """Handles speech processing with pyttsx3 and voice effects"""
     
-    speech_ready = pyqtSignal(str)
+    speech_ready = pyqtSignal(bytes, int)
     error_occurred = pyqtSignal(str)
     
-    def __init__(self, language='en'):
+    def __init__(self, tts_service: TTSService, effects: EffectChain = None,
+                 cache: TTSCache = None, language='en', code_policy='summarize'):
         super().__init__()
         self.language = language
+        self.effects = effects if effects is not None else default_voice_effects()
+        # Markdown to speakable text; code blocks are skipped or summarized
+        self.normalizer = SpeechNormalizer(code_policy)
         self.logger = logging.getLogger(__name__)
-        self.temp_dir = Path(tempfile.gettempdir()) / 'ai_assistant_speech'
-        self.temp_dir.mkdir(exist_ok=True)
         
-        # Initialize pyttsx3
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('voice', pyttsx3.init().getProperty('voices')[2].id) # its MS hazel don't hate me for not using jenny but she is far slower.
-        self.engine.setProperty('rate', 160)
-        self.engine.setProperty('volume', 0.8)
+        # Synthesis runs in the shared TTS process
+        self.tts_service = tts_service
         
-        # Initialize queue for async processing
+        # Processed sentences survive restarts in the on-disk cache
+        self.cache = cache
+        
+        # Queue for async processing, started on first use
         self.audio_queue = queue.Queue()
-        self.cache = {}
-        self._start_queue_processor()
+        self.queue_thread = None
 
     def clean_markdown(self, text: str) -> str:
-        """Remove markdown formatting from text"""
-        # Remove bold/italic markers
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove **bold**
-        text = re.sub(r'\*(.*?)\*', r'\1', text)      # Remove *italic*
-        text = re.sub(r'__(.*?)__', r'\1', text)      # Remove __bold__
-        text = re.sub(r'_(.*?)_', r'\1', text)        # Remove _italic_
-        # Remove code markers
-        text = re.sub(r'`(.*?)`', r'\1', text)        # Remove `code`
-        # Remove block code markers
-        text = re.sub(r'```.*?\n(.*?)```', r'\1', text, flags=re.DOTALL)
-        # Remove markdown links
-        text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)  # Convert [text](url) to just text
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        # Remove hashtags used for headers while keeping the text
-        text = re.sub(r'#{1,6}\s+', '', text)
-        # Remove bullet points to natural speech
-        text = re.sub(r'^\s*[-*+]\s+', ' ', text, flags=re.MULTILINE)
-        # Remove numbered lists to natural speech
-        text = re.sub(r'^\s*\d+\.\s+', ' ', text, flags=re.MULTILINE)
-        # Remove excessive newlines
-        text = re.sub(r'\n\s*\n', '\n', text)
-        # Remove any remaining special characters that might interfere with TTS
-        text = re.sub(r'[~\[\]{}|<>]', '', text)
-
-        return text.strip()
+        """Remove markdown formatting from text, see SpeechNormalizer"""
+        return self.normalizer.normalize(text)
 
     def pitch_shift(self, audio_segment, octaves):
         """Apply pitch shifting to audio"""
+        # Only the benchmark still uses this path; librosa and pydub are slow to import
+        import librosa
+        from pydub import AudioSegment
+        
         samples = np.array(audio_segment.get_array_of_samples()).astype(np.float32)
         sample_rate = audio_segment.frame_rate
         
@@ -85,39 +276,43 @@ class VoiceHandler(QObject):
             channels=1
         )
     
-    def add_reverb(self, audio, delay_ms, decay):
-        """Add reverb effect to audio"""
-        original = audio
-        reverb_sound = original.fade_out(int(delay_ms))
-        for i in range(2):
-            delay = int((i + 1) * delay_ms)
-            echo = original._spawn(original.raw_data)
-            echo = echo - (decay * (i + 1))
-            reverb_sound = reverb_sound.overlay(echo, position=delay)
-        return reverb_sound
+    def apply_voice_effects(self, buffer: np.ndarray, sample_rate: int) -> np.ndarray:
+        """Apply voice effects to a float32 buffer and return int16 samples"""
+        # Every effect works on the same float32 buffer; int16 only at the end
+        self.effects.process(buffer, sample_rate)
+        return to_int16(buffer)
     
-    def apply_voice_effects(self, audio_path: Path) -> Path:
-        """Apply voice effects to audio"""
-        audio = AudioSegment.from_wav(str(audio_path))
-        
-        # Apply effects in sequence
-        segments = []
-        chunk_size = 500
-        
-        for i in range(0, len(audio), chunk_size):
-            chunk = audio[i:i+chunk_size]
-            pitch_shift_amount = np.sin(i / 100) * 0.1
-            modified_chunk = self.pitch_shift(chunk, pitch_shift_amount)
-            segments.append(modified_chunk)
+    def synthesize(self, text: str):
+        """Turn one piece of text into (int16 PCM bytes, sample rate), or None if nothing is speakable"""
+        # Clean markdown before TTS processing
+        with TRACER.span('speech.clean'):
+            cleaned_text = self.clean_markdown(text)
+        if not cleaned_text:
+            return None
         
-        modified = sum(segments[1:], segments[0])
-        modified = self.add_reverb(modified, delay_ms=20, decay=0.05)
-        modified = modified.high_pass_filter(1000)
+        cache_key = None
+        if self.cache is not None:
+            with TRACER.span('tts.cache') as span:
+                cache_key = TTSCache.key(cleaned_text, self.tts_service.params(), self.effects.params())
+                cached = self.cache.get(cache_key)
+                span.set(hit=bool(cached))
+            if cached:
+                return cached
         
-        output_path = audio_path.parent / f"processed_{audio_path.name}"
-        modified.export(str(output_path), format="wav")
+        # Generate base TTS
+        with TRACER.span('tts.synthesize', chars=len(cleaned_text)):
+            buffer, sample_rate = self._generate_tts(cleaned_text)
+        # Apply voice effects
+        with TRACER.span('tts.effects', samples=len(buffer)):
+            pcm = self.apply_voice_effects(buffer, sample_rate).tobytes()
         
-        return output_path
+        if cache_key is not None:
+            self.cache.put(cache_key, pcm, sample_rate)
+        return pcm, sample_rate
+    
+    def lip_sync(self, pcm: bytes, sample_rate: int) -> bytes:
+        """Viseme track for a synthesized clip, see __lipsync"""
+        return viseme_track(pcm, sample_rate)
     
     def _start_queue_processor(self):
         """Start the background thread for processing TTS requests"""
@@ -128,14 +323,9 @@ class VoiceHandler(QObject):
                     if text is None:
                         break
                     
-                    # Clean markdown before TTS processing
-                    cleaned_text = self.clean_markdown(text)
-                    
-                    # Generate base TTS
-                    temp_path = self._generate_tts(cleaned_text)
-                    # Apply voice effects
-                    output_path = self.apply_voice_effects(temp_path)
-                    self.speech_ready.emit(str(output_path))
+                    audio = self.synthesize(text)
+                    if audio:
+                        self.speech_ready.emit(*audio)
                     
                 except Exception as e:
                     self.error_occurred.emit(str(e))
@@ -145,25 +335,24 @@ class VoiceHandler(QObject):
         self.queue_thread = threading.Thread(target=process_queue, daemon=True)
         self.queue_thread.start()
     
-    def _generate_tts(self, text: str) -> Path:
-        """Generate TTS audio file using pyttsx3"""
-        cache_key = hash(text)
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
-        output_path = self.temp_dir / f"tts_{cache_key}.wav"
-        self.engine.save_to_file(text, str(output_path))
-        self.engine.runAndWait()
-        
-        self.cache[cache_key] = output_path
-        return output_path
+    def _generate_tts(self, text: str):
+        """Generate TTS audio with pyttsx3 as a mono float32 buffer"""
+        pcm, sample_rate, channels = self.tts_service.synthesize(text)
+        buffer = to_float32(np.frombuffer(pcm, dtype=np.int16))
+        if channels > 1:
+            buffer = buffer.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+        return buffer, sample_rate
     
     def generate_speech(self, text: str):
         """Queue text for TTS generation"""
+        if self.queue_thread is None:
+            self._start_queue_processor()
         self.audio_queue.put(text)
     
     def record_speech(self):
         """Record speech and convert it to text"""
+        import speech_recognition as sr
+        
         recognizer = sr.Recognizer()
         with sr.Microphone() as source:
             self.logger.info("Listening...")
@@ -181,65 +370,198 @@ class VoiceHandler(QObject):
     
     def cleanup(self):
         """Clean up resources"""
-        self.audio_queue.put(None)
-        self.queue_thread.join()
-        self.engine.stop()
+        if self.queue_thread is not None:
+            self.audio_queue.put(None)
+            self.queue_thread.join()
+            self.queue_thread = None
 
 # Rest of the code remains the same...
 
+class PcmPlayer(QObject):
+    """Plays queued int16 mono PCM clips back to back straight from memory"""
+    
+    started = pyqtSignal()
+    idle = pyqtSignal()
+    # Lip-sync track of the clip that just started, with the start time in epoch ms
+    clip_started = pyqtSignal(bytes, float)
+    stopped = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.clips = deque()
+        self.output = None
+        self.buffer = None
+        self.sample_rate = None
+        # Trace id and start of the clip on air, for the playback span
+        self.playing = None
+    
+    def enqueue(self, pcm: bytes, sample_rate: int, track: bytes = b'', trace_id: str = None):
+        self.clips.append((pcm, sample_rate, track, trace_id, time.perf_counter_ns()))
+        if not self.is_playing():
+            self._play_next()
+    
+    def is_playing(self) -> bool:
+        return self.output is not None and self.output.state() == QAudio.ActiveState
+    
+    def stop(self):
+        """Stop playback and drop everything still queued"""
+        self.clips.clear()
+        if self.output is not None:
+            self.output.stop()
+        self._end_clip(stopped=True)
+        self.stopped.emit()
+    
+    def _play_next(self):
+        if not self.clips:
+            self.idle.emit()
+            return
+        
+        pcm, sample_rate, track, trace_id, enqueued = self.clips.popleft()
+        if self.output is None or sample_rate != self.sample_rate:
+            self._create_output(sample_rate)
+        
+        self.buffer = QBuffer(self)
+        self.buffer.setData(QByteArray(pcm))
+        self.buffer.open(QIODevice.ReadOnly)
+        self.output.start(self.buffer)
+        
+        # Time spent waiting behind the clips before it
+        started = time.perf_counter_ns()
+        TRACER.record('playback.queue', enqueued, started, trace_id)
+        self.playing = (trace_id, started, len(pcm) / 2 / sample_rate)
+        self.started.emit()
+        if track:
+            self.clip_started.emit(track, time.time() * 1000)
+    
+    def _create_output(self, sample_rate: int):
+        if self.output is not None:
+            self.output.stateChanged.disconnect(self._on_state_changed)
+            self.output.stop()
+            self.output.deleteLater()
+        
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(sample_rate)
+        audio_format.setChannelCount(1)
+        audio_format.setSampleSize(16)
+        audio_format.setCodec("audio/pcm")
+        audio_format.setByteOrder(QAudioFormat.LittleEndian)
+        audio_format.setSampleType(QAudioFormat.SignedInt)
+        
+        self.output = QAudioOutput(audio_format, self)
+        self.output.stateChanged.connect(self._on_state_changed)
+        self.sample_rate = sample_rate
+    
+    def _on_state_changed(self, state):
+        # Idle means the current clip's buffer has been drained
+        if state == QAudio.IdleState:
+            self.output.stop()
+            self._end_clip()
+            self._play_next()
+    
+    def _end_clip(self, stopped=False):
+        # The drained clip's PCM is not needed any more
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer.deleteLater()
+            self.buffer = None
+        if self.playing is None:
+            return
+        trace_id, started, seconds = self.playing
+        self.playing = None
+        TRACER.record('playback.play', started, time.perf_counter_ns(), trace_id,
+                      audio_ms=round(seconds * 1000), stopped=stopped)
+
+
 class VoiceWorker(QThread):
-    """Worker thread for voice processing"""
-    finished = pyqtSignal(str)
+    """Worker thread that synthesizes a reply sentence by sentence"""
+    segment_ready = pyqtSignal(bytes, int, bytes)
+    finished = pyqtSignal()
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
     
-    def __init__(self, text: str):
+    def __init__(self, voice_handler: VoiceHandler, text: str = None, trace_id: str = None):
         super().__init__()
-        self.text = text
-        self.voice_handler = None
+        self.sentences = queue.Queue()
+        self.voice_handler = voice_handler
+        self.trace_id = trace_id
+        self.cancelled = threading.Event()
+        
+        # A complete text is split up front, the same way as a stream; otherwise feed it with speak()
+        if text is not None:
+            splitter = SentenceSplitter()
+            for sentence in splitter.feed(text) + splitter.flush():
+                self.speak(sentence)
+            self.finish()
+    
+    def speak(self, sentence: str):
+        """Queue one sentence for synthesis"""
+        self.sentences.put(sentence)
+    
+    def finish(self):
+        """Signal that no more sentences will follow"""
+        self.sentences.put(None)
+    
+    def cancel(self):
+        """Drop the sentences not yet synthesized and stop after the current one"""
+        self.cancelled.set()
+        while True:
+            try:
+                self.sentences.get_nowait()
+            except queue.Empty:
+                break
+        self.finish()
     
     def run(self):
         try:
             self.progress.emit(10)
-            self.voice_handler = VoiceHandler()
-            self.voice_handler.speech_ready.connect(self._on_speech_ready)
-            self.voice_handler.error_occurred.connect(self._on_error)
             
-            self.progress.emit(20)
-            self.voice_handler.generate_speech(self.text)
+            with TRACER.activate(self.trace_id, 'VoiceWorker'):
+                while True:
+                    sentence = self.sentences.get()
+                    if sentence is None or self.cancelled.is_set():
+                        break
+                    # Each sentence is playable as soon as its own effects are done
+                    audio = self.voice_handler.synthesize(sentence)
+                    if self.cancelled.is_set():
+                        break
+                    if audio:
+                        with TRACER.span('lipsync'):
+                            track = self.voice_handler.lip_sync(*audio)
+                        self.segment_ready.emit(*audio, track)
             
-            self.exec_()
+            if not self.cancelled.is_set():
+                self.progress.emit(100)
+                self.finished.emit()
             
         except Exception as e:
-            self.error.emit(str(e))
-    
-    def _on_speech_ready(self, path):
-        self.progress.emit(100)
-        self.finished.emit(path)
-        self.quit()
-    
-    def _on_error(self, error_msg):
-        self.error.emit(error_msg)
-        self.quit()
+            if not self.cancelled.is_set():
+                self.error.emit(str(e))
     
     def cleanup(self):
-        if self.voice_handler:
-            self.voice_handler.cleanup()
+        # The handler and its TTS service are shared, so only stop feeding them
+        self.finish()
 
 # Example usage
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     
-    def on_finished(path):
-        print(f"Audio saved to: {path}")
-        app.quit()
+    def on_finished():
+        tts_service.shutdown()
+    
+    player = PcmPlayer()
+    player.idle.connect(app.quit)
     
     def on_error(error):
         print(f"Error: {error}")
+        tts_service.shutdown()
         app.quit()
     
+    tts_service = TTSService()
+    tts_service.start()
+    
     text = "Hello, this is a test of the voice generation system."
-    worker = VoiceWorker(text)
+    worker = VoiceWorker(VoiceHandler(tts_service), text)
+    worker.segment_ready.connect(player.enqueue)
     worker.finished.connect(on_finished)
     worker.error.connect(on_error)
     worker.start()
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import deque, Counter
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# Upper edges of the lateness histogram (ms); the last bucket is open-ended
+STALL_BUCKETS_MS = (16, 50, 100, 250, 500, 1000, 2500)
+
+
+def frame_name(frame) -> str:
+    """Qualified function name of a frame, stable across line numbers so stalls can be totalled"""
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+class StallWatchdog(QObject):
+    """Reports when the GUI thread stops servicing its event loop
+
+    A timer on the GUI thread beats every `interval_ms`. A sampler thread
+    checks the last beat; once it is more than `threshold_ms` old, it takes
+    the GUI thread's Python stack from sys._current_frames(). The frame just
+    above the event loop is the slot or handler Qt was running, and is
+    reported as the blame when the beat resumes.
+
+    The lateness of every beat goes into a histogram, so a regression shows
+    up as a shift between runs even when no single stall crosses the
+    threshold.
+    """
+
+    # Stall length in ms and the slot that was running
+    stalled = pyqtSignal(float, str)
+
+    def __init__(self, threshold_ms=100, interval_ms=20, history=100, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.logger = logging.getLogger(__name__)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._beat)
+        self.gui_thread = threading.get_ident()
+
+        # Shared with the sampler thread
+        self._lock = threading.Lock()
+        self.last_beat = None
+        self.loop_depth = 0
+        self.capture = None
+
+        self.counts = [0] * (len(STALL_BUCKETS_MS) + 1)
+        self.stalls = deque(maxlen=history)
+        self.stall_count = 0
+        self.blame_ms = Counter()
+
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self.last_beat = time.perf_counter()
+        self.timer.start()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='StallWatchdog', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self.timer.stop()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        # Frames below this slot belong to whoever runs the event loop
+        depth = 0
+        frame = sys._getframe(1)
+        while frame is not None:
+            depth += 1
+            frame = frame.f_back
+
+        with self._lock:
+            late = now - self.last_beat - self.interval
+            capture, self.capture = self.capture, None
+            self.last_beat = now
+            self.loop_depth = depth
+
+        late_ms = max(late, 0.0) * 1000
+        self.counts[self._bucket(late_ms)] += 1
+        if late >= self.threshold:
+            blame, stack = capture or ('unknown', '')
+            self.stall_count += 1
+            self.stalls.append((time.time(), late_ms, blame))
+            self.blame_ms[blame] += late_ms
+            self.logger.warning(f"GUI thread stalled for {late_ms:.0f} ms in {blame}\n{stack}")
+            self.stalled.emit(late_ms, blame)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                if self.capture is not None or time.perf_counter() - self.last_beat < self.threshold:
+                    continue
+                depth = self.loop_depth
+            frame = sys._current_frames().get(self.gui_thread)
+            if frame is None:
+                continue
+            capture = self._blame(frame, depth)
+            with self._lock:
+                self.capture = capture
+
+    def _blame(self, frame, depth):
+        """(slot description, formatted stack) for the GUI thread's current frame"""
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+
+        slot = frames[min(depth, len(frames) - 1)]
+        blame = frame_name(slot)
+        # A lambda connected as a slot only forwards to the real handler
+        if slot.f_code.co_name == '<lambda>' and depth + 1 < len(frames):
+            blame += " > " + frame_name(frames[depth + 1])
+        stack = ''.join(traceback.format_stack(frames[-1]))
+        return blame, stack
+
+    @staticmethod
+    def _bucket(ms):
+        for index, edge in enumerate(STALL_BUCKETS_MS):
+            if ms < edge:
+                return index
+        return len(STALL_BUCKETS_MS)
+
+    def histogram(self):
+        """[(bucket label, beats)] of how late each heartbeat was"""
+        labels = []
+        lower = 0
+        for edge in STALL_BUCKETS_MS:
+            labels.append(f"{lower}-{edge} ms")
+            lower = edge
+        labels.append(f">={lower} ms")
+        return list(zip(labels, self.counts))
+
+    def snapshot(self):
+        return {
+            'threshold_ms': self.threshold * 1000,
+            'histogram': dict(self.histogram()),
+            'count': self.stall_count,
+            'stalls': [{'time': when, 'ms': ms, 'blame': blame} for when, ms, blame in self.stalls],
+            'blame_ms': dict(self.blame_ms.most_common()),
+        }
+
+    def report(self) -> str:
+        buckets = ", ".join(f"{label} {count}" for label, count in self.histogram() if count)
+        line = f"GUI stalls over {self.threshold * 1000:.0f} ms: {self.stall_count}; heartbeat lateness: {buckets}"
+        if self.blame_ms:
+            blame, ms = self.blame_ms.most_common(1)[0]
+            line += f"; worst: {blame} {ms:.0f} ms"
+        return line